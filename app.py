@@ -1,4 +1,6 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
+from werkzeug.utils import secure_filename
+from datetime import datetime
 from email_agent import EmailAgent
 from config import Config
 import threading
@@ -7,8 +9,59 @@ import time
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Global email agent instance
-email_agent = EmailAgent()
+# Global email agent instance, built on first use so workers serve '/' immediately
+# and nothing that holds files or connections is created before a pre-fork
+_email_agent = None
+_email_agent_lock = threading.Lock()
+
+def get_email_agent() -> EmailAgent:
+    """Return the shared email agent, creating it on first call"""
+    global _email_agent
+    if _email_agent is None:
+        with _email_agent_lock:
+            if _email_agent is None:
+                _email_agent = EmailAgent()
+                # Every worker runs the polling loop so the mailbox lease can fail over
+                threading.Thread(target=autonomous_processing, args=(_email_agent,), daemon=True).start()
+                if Config.PRECOMPUTE_DRAFTS:
+                    threading.Thread(target=precompute_drafts, args=(_email_agent,), daemon=True).start()
+    return _email_agent
+
+def autonomous_processing(email_agent: EmailAgent):
+    """Background loop: the worker holding the mailbox lease polls, the others stand by for failover"""
+    while True:
+        try:
+            if not email_agent.claim_mailbox():
+                time.sleep(60)
+                continue
+            # Switched on by /auto_process in any worker; the preference is shared through its file
+            if not email_agent.user_preferences.get('auto_process_enabled', False):
+                time.sleep(60)
+                continue
+            email_agent.sync_headers()
+            if email_agent.user_preferences.get('auto_reply_enabled', False):
+                result = email_agent.process_inbox(interactive=False)
+                print(f"Auto-processed {result.get('total_unread', 0)} emails, "
+                      f"sent {result.get('auto_replies_sent', 0)} auto-replies")
+            email_agent.run_deferred_work()
+            email_agent.replay_degraded_work()
+            time.sleep(300)  # Check every 5 minutes
+        except Exception as e:
+            print(f"Auto-processing error: {e}")
+            time.sleep(60)  # Wait 1 minute before retry
+
+def precompute_drafts(email_agent: EmailAgent):
+    """Background loop: draft replies for newly synced mail before the user asks"""
+    while True:
+        try:
+            # The lease holder precomputes; its drafts are shared through the cache file
+            if email_agent.owns_mailbox():
+                email_agent.replay_degraded_work()
+                if email_agent.sync_headers():
+                    email_agent.precompute_drafts()
+        except Exception as e:
+            print(f"Draft precompute error: {e}")
+        time.sleep(Config.PRECOMPUTE_INTERVAL)
 
 @app.route('/')
 def index():
@@ -19,7 +72,7 @@ def index():
 def process_inbox():
     """Process inbox and return results"""
     try:
-        result = email_agent.process_inbox()
+        result = get_email_agent().process_inbox()
         return jsonify({
             'success': True,
             'data': result
@@ -30,6 +83,15 @@ def process_inbox():
             'error': str(e)
         }), 500
 
+def message_uid(data) -> int:
+    """Optional IMAP UID from a request body; deferred drafts are already read and must be found by UID"""
+    uid = data.get('uid')
+    if uid is None or uid == '':
+        return None
+    if isinstance(uid, bool) or not str(uid).isdigit() or int(uid) == 0:
+        raise ValueError("'uid' must be a positive integer")
+    return int(uid)
+
 @app.route('/send_reply', methods=['POST'])
 def send_reply():
     """Send a manual reply"""
@@ -37,14 +99,28 @@ def send_reply():
     email_id = data.get('email_id')
     reply_text = data.get('reply_text')
     
-    if not email_id or not reply_text:
+    try:
+        uid = message_uid(data)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    if not (email_id or uid) or not reply_text:
         return jsonify({
             'success': False,
             'error': 'Missing email_id or reply_text'
         }), 400
     
     try:
-        success = email_agent.send_manual_reply(email_id, reply_text)
+        success = get_email_agent().send_manual_reply(
+            email_id,
+            reply_text,
+            suggested_reply=data.get('suggested_reply'),
+            category=data.get('category'),
+            uid=uid
+        )
         return jsonify({
             'success': success,
             'message': 'Reply sent successfully' if success else 'Failed to send reply'
@@ -61,14 +137,22 @@ def approve_reply():
     data = request.get_json()
     email_id = data.get('email_id')
     
-    if not email_id:
+    try:
+        uid = message_uid(data)
+    except ValueError as e:
         return jsonify({
             'success': False,
-            'error': 'Missing email_id'
+            'error': str(e)
+        }), 400
+    
+    if not (email_id or uid):
+        return jsonify({
+            'success': False,
+            'error': 'Missing email_id or uid'
         }), 400
     
     try:
-        success = email_agent.approve_suggested_reply(email_id)
+        success = get_email_agent().approve_suggested_reply(email_id, category=data.get('category'), uid=uid)
         return jsonify({
             'success': success,
             'message': 'Reply sent successfully' if success else 'Failed to send reply'
@@ -79,34 +163,228 @@ def approve_reply():
             'error': str(e)
         }), 500
 
+@app.route('/reject_reply', methods=['POST'])
+def reject_reply():
+    """Dismiss a suggested reply so the policy trainer learns from it"""
+    data = request.get_json()
+    email_id = data.get('email_id')
+    
+    try:
+        uid = message_uid(data)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    if not (email_id or uid):
+        return jsonify({
+            'success': False,
+            'error': 'Missing email_id or uid'
+        }), 400
+    
+    try:
+        success = get_email_agent().reject_suggested_reply(email_id, category=data.get('category'), uid=uid)
+        return jsonify({
+            'success': success,
+            'message': 'Suggestion dismissed' if success else 'Email not found'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/preferences', methods=['GET', 'POST'])
 def preferences():
     """Get or update user preferences"""
     if request.method == 'GET':
         return jsonify({
             'success': True,
-            'preferences': email_agent.user_preferences
+            'preferences': get_email_agent().user_preferences
         })
     
     if request.method == 'POST':
         try:
             new_preferences = request.get_json()
-            email_agent.update_preferences(new_preferences)
+            get_email_agent().update_preferences(new_preferences)
             return jsonify({
                 'success': True,
                 'message': 'Preferences updated successfully'
             })
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
 
+@app.route('/emails')
+def emails():
+    """Browse indexed emails with cursor pagination (no IMAP or LLM calls)"""
+    args = request.args
+    try:
+        unread = args.get('unread')
+        page = get_email_agent().browse_emails(
+            limit=max(1, min(int(args.get('limit', 25)), 100)),
+            cursor=args.get('cursor'),
+            sort=args.get('sort', 'date'),
+            order=args.get('order', 'desc'),
+            category=args.get('category'),
+            sender=args.get('sender'),
+            since=datetime.fromisoformat(args['since']) if args.get('since') else None,
+            until=datetime.fromisoformat(args['until']) if args.get('until') else None,
+            unread=None if unread is None else unread.lower() == 'true'
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'emails': page['emails'],
+        'next_cursor': page['next_cursor']
+    })
+
+@app.route('/search')
+def search():
+    """Full-text search over processed mail and sent replies"""
+    args = request.args
+    try:
+        results = get_email_agent().search_emails(
+            args.get('q', ''),
+            limit=max(1, min(int(args.get('limit', 20)), 100)),
+            sender=args.get('sender'),
+            kind=args.get('kind')
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
+
+@app.route('/emails/<int:uid>/attachments/<part>')
+def download_attachment(uid, part):
+    """Stream one attachment using the uid/part/encoding of its handle in an email's 'attachments'"""
+    args = request.args
+    try:
+        spilled = get_email_agent().download_attachment(uid, part, args.get('encoding', 'base64'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    if spilled is None:
+        return jsonify({
+            'success': False,
+            'error': 'Attachment not found'
+        }), 404
+    
+    def generate():
+        try:
+            data = spilled.data
+            for offset in range(0, spilled.size, Config.LAZY_CHUNK_BYTES):
+                yield bytes(data[offset:offset + Config.LAZY_CHUNK_BYTES])
+        finally:
+            spilled.close()
+    
+    filename = secure_filename(args.get('name', '')) or f"part-{part}"
+    return Response(generate(), mimetype=args.get('content_type', 'application/octet-stream'), headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Length': str(spilled.size)
+    })
+
+@app.route('/emails/sync', methods=['POST'])
+def sync_emails():
+    """Refresh the local header index from IMAP"""
+    try:
+        added = get_email_agent().sync_headers()
+        return jsonify({
+            'success': True,
+            'new_emails': added
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/drafts')
+def drafts():
+    """Suggested replies generated off-peak and waiting for review"""
+    try:
+        return jsonify({
+            'success': True,
+            'drafts': get_email_agent().get_deferred_drafts()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/sender_override', methods=['POST'])
+def sender_override():
+    """Pin a category or auto-reply choice for a sender"""
+    data = request.get_json()
+    sender = data.get('sender')
+    
+    if not sender or not isinstance(sender, str):
+        return jsonify({
+            'success': False,
+            'error': 'Missing sender'
+        }), 400
+    
+    overrides = {key: data[key] for key in ('category', 'auto_reply') if key in data}
+    try:
+        get_email_agent().set_sender_override(sender, **overrides)
+        return jsonify({
+            'success': True,
+            'message': 'Sender override saved'
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/stats')
 def stats():
     """Get agent statistics"""
     try:
-        stats = email_agent.get_stats()
+        stats = get_email_agent().get_stats()
         return jsonify({
             'success': True,
             'stats': stats
@@ -120,21 +398,14 @@ def stats():
 @app.route('/auto_process')
 def auto_process():
     """Start autonomous processing in background"""
-    def autonomous_processing():
-        while True:
-            try:
-                if email_agent.user_preferences.get('auto_reply_enabled', False):
-                    result = email_agent.process_inbox()
-                    print(f"Auto-processed {result.get('total_unread', 0)} emails, "
-                          f"sent {result.get('auto_replies_sent', 0)} auto-replies")
-                time.sleep(300)  # Check every 5 minutes
-            except Exception as e:
-                print(f"Auto-processing error: {e}")
-                time.sleep(60)  # Wait 1 minute before retry
-    
-    # Start background thread
-    thread = threading.Thread(target=autonomous_processing, daemon=True)
-    thread.start()
+    try:
+        # The polling loop already runs in every worker; whichever holds the lease picks this up
+        get_email_agent().enable_auto_processing()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
     
     return jsonify({
         'success': True,
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from config import Config
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open"""
+
+
+class CircuitBreaker:
+    """Failure-rate and latency circuit breaker.
+
+    Outcomes of the last `window_size` calls are tracked; calls slower than
+    `slow_call_seconds` count as failures. Once at least `min_calls` have been
+    seen and the failure rate reaches the threshold the circuit opens and
+    calls fail fast. After `open_seconds` a single probe is let through
+    (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, window_size: Optional[int] = None, min_calls: Optional[int] = None,
+                 failure_rate: Optional[float] = None, slow_call_seconds: Optional[float] = None,
+                 open_seconds: Optional[float] = None):
+        self.name = name
+        self.window_size = window_size or Config.BREAKER_WINDOW
+        self.min_calls = min_calls or Config.BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate or Config.BREAKER_FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds or Config.BREAKER_SLOW_CALL_SECONDS
+        self.open_seconds = open_seconds or Config.BREAKER_OPEN_SECONDS
+        self._outcomes = deque(maxlen=self.window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def _before_call(self) -> bool:
+        """Decide whether a call may proceed; returns True if it is the half-open probe"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return False
+            if time.monotonic() - self._opened_at < self.open_seconds or self._probe_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def _after_call(self, success: bool, is_probe: bool):
+        with self._lock:
+            if is_probe:
+                self._probe_in_flight = False
+                if success:
+                    print(f"{self.name} circuit closed after successful probe")
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self._state == self.CLOSED and len(self._outcomes) >= self.min_calls and
+                    failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def _open(self):
+        print(f"{self.name} circuit opened; failing fast for {self.open_seconds}s")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Run func through the breaker, raising CircuitOpenError while open"""
+        is_probe = self._before_call()
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._after_call(False, is_probe)
+            raise
+        self._after_call(time.monotonic() - started < self.slow_call_seconds, is_probe)
+        return result
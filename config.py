@@ -16,6 +16,83 @@ class Config:
     SECRET_KEY = os.getenv('FLASK_SECRET_KEY')
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
+    PREFERENCES_FILE = os.getenv('PREFERENCES_FILE', 'user_preferences.json')
+    PREFERENCES_DIR = os.getenv('PREFERENCES_DIR', 'preferences')
+    PREFERENCES_PER_ACCOUNT = os.getenv('PREFERENCES_PER_ACCOUNT', 'False').lower() == 'true'
+    PREFERENCES_WRITE_DELAY = float(os.getenv('PREFERENCES_WRITE_DELAY', 2.0))
+
+    LEARNING_LOG_DIR = os.getenv('LEARNING_LOG_DIR', 'learning_log')
+    LEARNING_SEGMENT_MAX_BYTES = int(os.getenv('LEARNING_SEGMENT_MAX_BYTES', 1024 * 1024))
+    LEARNING_MAX_SEGMENTS = int(os.getenv('LEARNING_MAX_SEGMENTS', 50))
+    POLICY_FILE = os.getenv('POLICY_FILE', 'learned_policies.json')
+    POLICY_MIN_EVENTS = int(os.getenv('POLICY_MIN_EVENTS', 5))
+    POLICY_AUTO_APPROVE_RATE = float(os.getenv('POLICY_AUTO_APPROVE_RATE', 0.9))
+
+    SENDER_INDEX_FILE = os.getenv('SENDER_INDEX_FILE', 'sender_index.db')
+    SENDER_INDEX_MIN_SAMPLES = int(os.getenv('SENDER_INDEX_MIN_SAMPLES', 5))
+    SENDER_INDEX_CONFIDENCE = float(os.getenv('SENDER_INDEX_CONFIDENCE', 0.9))
+
+    SENT_LOG_FILE = os.getenv('SENT_LOG_FILE', 'sent_replies.jsonl')
+    SENT_LOG_WINDOW_HOURS = float(os.getenv('SENT_LOG_WINDOW_HOURS', 24))
+    SENT_LOG_BLOOM_BITS = int(os.getenv('SENT_LOG_BLOOM_BITS', 1 << 20))
+    SENT_LOG_BLOOM_HASHES = int(os.getenv('SENT_LOG_BLOOM_HASHES', 7))
+
+    HEADER_INDEX_FILE = os.getenv('HEADER_INDEX_FILE', 'header_index.db')
+    HEADER_SYNC_BATCH = int(os.getenv('HEADER_SYNC_BATCH', 500))
+    # Full read-state sweep of the mailbox; also catches deletions CONDSTORE does not report
+    HEADER_FLAG_SWEEP_SECONDS = int(os.getenv('HEADER_FLAG_SWEEP_SECONDS', 3600))
+
+    LAZY_FETCH = os.getenv('LAZY_FETCH', 'False').lower() == 'true'
+    LAZY_BODY_MAX_BYTES = int(os.getenv('LAZY_BODY_MAX_BYTES', 64 * 1024))
+    LAZY_CHUNK_BYTES = int(os.getenv('LAZY_CHUNK_BYTES', 1024 * 1024))
+    LAZY_SPILL_BYTES = int(os.getenv('LAZY_SPILL_BYTES', 1024 * 1024))
+
+    LEASE_BACKEND = os.getenv('LEASE_BACKEND', 'sqlite')
+    LEASE_SQLITE_FILE = os.getenv('LEASE_SQLITE_FILE', 'leases.db')
+    LEASE_REDIS_URL = os.getenv('LEASE_REDIS_URL', 'redis://localhost:6379/0')
+    LEASE_TTL = float(os.getenv('LEASE_TTL', 60))
+
+    SCHEDULER_OFF_PEAK_START = float(os.getenv('SCHEDULER_OFF_PEAK_START', 6))
+    SCHEDULER_OFF_PEAK_END = float(os.getenv('SCHEDULER_OFF_PEAK_END', 8))
+    SCHEDULER_BATCH_SIZE = int(os.getenv('SCHEDULER_BATCH_SIZE', 10))
+    DEFERRED_QUEUE_FILE = os.getenv('DEFERRED_QUEUE_FILE', 'deferred_queue.json')
+    DEFERRED_MAX_ENTRIES = int(os.getenv('DEFERRED_MAX_ENTRIES', 500))
+    DEFERRED_MAX_AGE_HOURS = float(os.getenv('DEFERRED_MAX_AGE_HOURS', 72))
+    DEFERRED_BODY_MAX_CHARS = int(os.getenv('DEFERRED_BODY_MAX_CHARS', 2000))
+
+    PRECOMPUTE_DRAFTS = os.getenv('PRECOMPUTE_DRAFTS', 'False').lower() == 'true'
+    PRECOMPUTE_INTERVAL = int(os.getenv('PRECOMPUTE_INTERVAL', 60))
+    DRAFT_CACHE_FILE = os.getenv('DRAFT_CACHE_FILE', 'draft_cache.json')
+    DRAFT_CACHE_MAX_ENTRIES = int(os.getenv('DRAFT_CACHE_MAX_ENTRIES', 500))
+    SUMMARY_CACHE_FILE = os.getenv('SUMMARY_CACHE_FILE', 'summary_cache.json')
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', 20))
+
+    BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 20))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 5))
+    BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.getenv('BREAKER_SLOW_CALL_SECONDS', 20))
+    BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 60))
+    REPLAY_QUEUE_MAX = int(os.getenv('REPLAY_QUEUE_MAX', 200))
+
+    MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'gemini')
+    MODEL_FAST = os.getenv('MODEL_FAST', 'gemini-2.0-flash-lite')
+    MODEL_STRONG = os.getenv('MODEL_STRONG', 'gemini-2.0-flash')
+    # JSON rule list, e.g. [{"task": "categorize", "model": "..."}], and {"model": [input, output]} USD per 1k tokens
+    MODEL_ROUTES = os.getenv('MODEL_ROUTES', '')
+    MODEL_COSTS = os.getenv('MODEL_COSTS', '')
+
+    ACTION_FLUSH_SIZE = int(os.getenv('ACTION_FLUSH_SIZE', 50))
+    ACTION_RETRY_SECONDS = float(os.getenv('ACTION_RETRY_SECONDS', 30))
+    ACTION_RETRY_MAX_SECONDS = float(os.getenv('ACTION_RETRY_MAX_SECONDS', 900))
+    CATEGORY_LABEL_PREFIX = os.getenv('CATEGORY_LABEL_PREFIX', '')
+    ARCHIVE_AUTO_REPLIED = os.getenv('ARCHIVE_AUTO_REPLIED', 'False').lower() == 'true'
+    ARCHIVE_MAILBOX = os.getenv('ARCHIVE_MAILBOX', '[Gmail]/All Mail')
+
+    SEARCH_INDEX_FILE = os.getenv('SEARCH_INDEX_FILE', 'search_index.db')
+    SEARCH_BODY_MAX_CHARS = int(os.getenv('SEARCH_BODY_MAX_CHARS', 20000))
+    SEARCH_CONTEXT_MESSAGES = int(os.getenv('SEARCH_CONTEXT_MESSAGES', 3))
+    SEARCH_CONTEXT_CANDIDATES = int(os.getenv('SEARCH_CONTEXT_CANDIDATES', 200))
+
     AUTO_REPLY_CATEGORIES = [
         'calendar_invite',
         'newsletter',
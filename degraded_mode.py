@@ -0,0 +1,61 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+# Categories the categorize prompt offers; anything else the model answers is free text
+KNOWN_CATEGORIES = (
+    'calendar_invite', 'newsletter', 'notification', 'confirmation', 'personal', 'business', 'urgent'
+)
+
+# Keyword rules for classifying mail while Gemini is unavailable, checked in order
+LOCAL_CATEGORY_RULES = [
+    ('urgent', re.compile(r'\b(urgent|asap|immediately|emergency|action required)\b', re.IGNORECASE)),
+    ('calendar_invite', re.compile(r'\b(invitation|invite|meeting|calendar|rsvp|event)\b|\.ics\b', re.IGNORECASE)),
+    ('confirmation', re.compile(r'\b(confirm(ed|ation)?|booking|reservation|order (number|#))\b', re.IGNORECASE)),
+    ('notification', re.compile(r'\b(notification|receipt|alert|password|sign-?in|security|verify)\b', re.IGNORECASE)),
+    ('newsletter', re.compile(r'\b(newsletter|unsubscribe|digest|weekly|promo(tion)?|sale|offer)\b', re.IGNORECASE)),
+]
+AUTOMATED_SENDER_PATTERN = re.compile(r'(no-?reply|do-?not-?reply|notifications?|mailer|news)@', re.IGNORECASE)
+# Subject words that make a message latency-sensitive, for scheduling and model routing
+URGENT_PATTERN = re.compile(r'\b(urgent|asap|immediately|important|action required|deadline)\b', re.IGNORECASE)
+
+REPLY_TEMPLATES = {
+    'calendar_invite': "Thank you for the invitation. I have received it and will confirm my availability shortly.",
+    'newsletter': "Thank you, received.",
+    'notification': "Thank you for the notification.",
+    'confirmation': "Thank you for the confirmation.",
+}
+DEFAULT_REPLY_TEMPLATE = "Thank you for your email. I have received it and will get back to you as soon as possible."
+
+
+def local_categorize(email: Dict) -> str:
+    """Classify an email with keyword rules, no model call"""
+    text = f"{email.get('subject', '')}\n{email.get('body', '')[:1000]}"
+    for category, pattern in LOCAL_CATEGORY_RULES:
+        if pattern.search(text):
+            return category
+    if AUTOMATED_SENDER_PATTERN.search(email.get('sender', '')):
+        return 'notification'
+    return 'business'
+
+
+def template_reply(category: str, user_preferences: Optional[Dict] = None) -> str:
+    """Canned reply for a category, signed with the user's signature"""
+    signature = (user_preferences or {}).get('signature', 'Best regards')
+    return f"{REPLY_TEMPLATES.get(category, DEFAULT_REPLY_TEMPLATE)}\n\n{signature}"
+
+
+def local_summary(emails: List[Dict]) -> str:
+    """Plain summary built from headers and local categories"""
+    categories = Counter(local_categorize(email) for email in emails)
+    senders = Counter(email.get('sender', 'Unknown') for email in emails)
+    lines = [
+        f"AI summary unavailable; showing a local overview of {len(emails)} emails.",
+        "Categories: " + ", ".join(f"{category} ({count})" for category, count in categories.most_common()),
+        "Top senders: " + ", ".join(sender for sender, _ in senders.most_common(3))
+    ]
+    urgent = [email['subject'] for email in emails if local_categorize(email) == 'urgent']
+    if urgent:
+        lines.append("Possibly urgent: " + "; ".join(urgent))
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional
+from config import Config
+from file_utils import JsonStateFile
+
+
+# Only these preferences change the text of a generated reply
+FINGERPRINT_KEYS = ('response_tone', 'signature')
+
+
+def preferences_fingerprint(preferences: Dict) -> str:
+    """Short hash of the preferences that shape generated replies"""
+    relevant = {key: preferences.get(key) for key in FINGERPRINT_KEYS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def summary_key(emails: List[Dict]) -> str:
+    """Short hash of the set of messages a summary covers, independent of their order"""
+    message_ids = sorted(email.get('message_id') or email.get('id', '') for email in emails)
+    return hashlib.sha1('\n'.join(message_ids).encode()).hexdigest()[:16]
+
+
+class DraftCache(JsonStateFile):
+    """Precomputed category and suggested reply per message.
+
+    Entries remember the preferences fingerprint they were generated with, so
+    a change of tone or signature makes them stale without a separate sweep.
+    """
+
+    label = 'draft cache'
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or Config.DRAFT_CACHE_MAX_ENTRIES
+        super().__init__(path or Config.DRAFT_CACHE_FILE)
+
+    def get(self, message_id: str, fingerprint: str) -> Optional[Dict]:
+        """Cached draft for a message, if generated with the current preferences"""
+        entry = self._entries.get(message_id) if message_id else None
+        if entry and entry['fingerprint'] == fingerprint:
+            return entry
+        return None
+
+    def put(self, message_id: str, fingerprint: str, category: str, suggested_reply: str):
+        if not message_id:
+            return
+        with self._lock:
+            self._set(message_id, {
+                'fingerprint': fingerprint,
+                'category': category,
+                'suggested_reply': suggested_reply,
+                'created_at': time.time()
+            })
+            self._evict_oldest(self.max_entries)
+
+    def discard(self, message_id: str):
+        with self._lock:
+            self._delete(message_id)
+
+    def invalidate(self, fingerprint: str):
+        """Drop every draft not generated with the given preferences"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry['fingerprint'] != fingerprint]
+            for key in stale:
+                self._delete(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SummaryCache(JsonStateFile):
+    """Inbox summaries precomputed for a set of unread messages"""
+
+    label = 'summary cache'
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or Config.SUMMARY_CACHE_MAX_ENTRIES
+        super().__init__(path or Config.SUMMARY_CACHE_FILE)
+
+    def get(self, emails: List[Dict]) -> Optional[str]:
+        """Cached summary of exactly these messages"""
+        entry = self._entries.get(summary_key(emails))
+        return entry['summary'] if entry else None
+
+    def put(self, emails: List[Dict], summary: str):
+        with self._lock:
+            self._set(summary_key(emails), {'summary': summary, 'created_at': time.time()})
+            self._evict_oldest(self.max_entries)
@@ -1,45 +1,79 @@
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Tuple
 from email_client import EmailClient
 from gemini_service import GeminiService
-import json
-import os
+from preferences_store import PreferencesStore
+from sender_index import SenderIndex, NOT_PROVIDED
+from sent_log import SentReplyLog, is_auto_generated
+from degraded_mode import KNOWN_CATEGORIES
+from header_index import HeaderIndex
+from mailbox_lease import MailboxLease
+from scheduler import WorkScheduler
+from draft_cache import DraftCache, SummaryCache, preferences_fingerprint
+from mailbox_actions import MailboxActions
+from search_index import SearchIndex
+from config import Config
 
 class EmailAgent:
     def __init__(self, max_emails_to_process: int = 5):
-        self.email_client = EmailClient()
-        self.gemini_service = GeminiService()
-        self.user_preferences = self._load_user_preferences()
+        self._email_client = None
+        self._gemini_service = None
+        self._lazy_lock = threading.Lock()
+        account = Config.EMAIL_ADDRESS if Config.PREFERENCES_PER_ACCOUNT else None
+        self.preferences_store = PreferencesStore(account=account)
+        self.sender_index = SenderIndex()
+        self.sent_log = SentReplyLog()
+        self.header_index = HeaderIndex()
+        self.mailbox_lease = MailboxLease(f"{Config.EMAIL_ADDRESS}/INBOX")
+        self.scheduler = WorkScheduler(self.preferences_store, self.sender_index)
+        self.draft_cache = DraftCache()
+        self.summary_cache = SummaryCache()
+        self.mailbox_actions = MailboxActions()
+        self.search_index = SearchIndex()
         self.max_emails_to_process = max_emails_to_process
     
-    def _load_user_preferences(self) -> Dict:
-        """Load user preferences from file"""
-        try:
-            if os.path.exists('user_preferences.json'):
-                with open('user_preferences.json', 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading preferences: {e}")
-        
-        return {
-            'auto_reply_enabled': True,
-            'response_tone': 'professional',
-            'signature': 'Best regards',
-            'working_hours': {'start': 9, 'end': 17},
-            'auto_categories': ['calendar_invite', 'newsletter']
-        }
+    @property
+    def email_client(self) -> EmailClient:
+        """IMAP/SMTP client, created on first use"""
+        if self._email_client is None:
+            with self._lazy_lock:
+                if self._email_client is None:
+                    self._email_client = EmailClient()
+        return self._email_client
     
-    def _save_user_preferences(self):
-        """Save user preferences to file"""
-        try:
-            with open('user_preferences.json', 'w') as f:
-                json.dump(self.user_preferences, f, indent=2)
-        except Exception as e:
-            print(f"Error saving preferences: {e}")
+    @property
+    def gemini_service(self) -> GeminiService:
+        """Gemini service, created on first use"""
+        if self._gemini_service is None:
+            with self._lazy_lock:
+                if self._gemini_service is None:
+                    self._gemini_service = GeminiService(search_index=self.search_index)
+        return self._gemini_service
+    
+    @property
+    def user_preferences(self) -> Dict:
+        """Current preferences snapshot (read-only), including changes saved by other workers"""
+        self.preferences_store.refresh()
+        return self.preferences_store.snapshot()
     
-    def process_inbox(self) -> Dict:
-        """Main function to process inbox - LIMITED to first few emails to save API quota"""
-        # Get unread emails but limit the fetch itself to save resources
-        unread_emails = self.email_client.get_unread_emails(limit=self.max_emails_to_process)
+    def refresh_shared_state(self):
+        """Pick up sent replies, drafts and summaries other workers saved since the last run"""
+        self.sent_log.refresh()
+        self.draft_cache.refresh()
+        self.summary_cache.refresh()
+        self.scheduler.deferred.refresh()
+    
+    def process_inbox(self, interactive: bool = True) -> Dict:
+        """Main function to process inbox - LIMITED to first few emails to save API quota
+        
+        Unattended runs (interactive=False) outside working hours defer suggested
+        replies for human-review mail to the scheduler's off-peak batches.
+        """
+        # Get unread emails but limit the fetch itself to save resources. Always peek:
+        # only the lease holder marks mail read, with its batched mailbox actions,
+        # so a /process in another worker cannot hide mail from the polling loop
+        unread_emails = self.email_client.get_unread_emails(limit=self.max_emails_to_process, peek=True)
+        self.refresh_shared_state()
         
         total_unread_count = self._get_total_unread_count()
         
@@ -59,60 +93,30 @@ class EmailAgent:
         
         print(f"Processing {len(emails_to_process)} out of {total_unread_count} unread emails (quota limit: {self.max_emails_to_process})")
         
-        # Generate summary only for the limited set
-        summary = self.gemini_service.summarize_emails(emails_to_process)
+        defer_drafts = self.scheduler.should_defer_drafts(interactive)
+        emails_to_process = self._prioritize(emails_to_process)
+        
+        # Generate summary only for the limited set, and only if someone is around to read it
+        if defer_drafts:
+            summary = 'Summary deferred until working hours.'
+        else:
+            summary = self._summarize(emails_to_process)
         
         processed_emails = []
         auto_replies_sent = 0
+        auto_reply_allowed = self.owns_mailbox()
         
         for email in emails_to_process:
-            try:
-                print(f"Processing email: {email['subject'][:50]}...")
-                
-                # Generate reply
-                suggested_reply = self.gemini_service.generate_reply(
-                    email, self.user_preferences
-                )
-                
-                # Check if should auto-reply
-                should_auto_reply = (
-                    self.user_preferences.get('auto_reply_enabled', False) and
-                    self.gemini_service.should_auto_reply(email)
-                )
-                
-                email_result = {
-                    'email': email,
-                    'suggested_reply': suggested_reply,
-                    'auto_reply_sent': False,
-                    'category': self.gemini_service.categorize_email(email)
-                }
-                
-                # Send auto-reply if enabled and appropriate
-                if should_auto_reply:
-                    sender_email = self._extract_email_address(email['sender'])
-                    if self.email_client.send_reply(
-                        sender_email, 
-                        email['subject'], 
-                        suggested_reply
-                    ):
-                        email_result['auto_reply_sent'] = True
-                        auto_replies_sent += 1
-                        
-                        # Mark as read
-                        self.email_client.mark_as_read(email['id'])
-                
-                processed_emails.append(email_result)
-                
-            except Exception as e:
-                print(f"Error processing email '{email['subject'][:30]}...': {e}")
-                # Add basic info even if processing failed
-                processed_emails.append({
-                    'email': email,
-                    'suggested_reply': f"Error processing: {str(e)}",
-                    'auto_reply_sent': False,
-                    'category': 'error',
-                    'error': str(e)
-                })
+            email_result = self._process_email(email, auto_reply_allowed, defer_drafts)
+            if email_result['auto_reply_sent']:
+                auto_replies_sent += 1
+            if auto_reply_allowed:
+                self._mark_read(email)
+            processed_emails.append(email_result)
+        
+        self.flush_mailbox_actions()
+        self.draft_cache.save()
+        self.scheduler.deferred.save()
         
         return {
             'summary': summary,
@@ -121,9 +125,285 @@ class EmailAgent:
             'total_unread': total_unread_count,
             'processed_count': len(emails_to_process),
             'quota_limited': quota_limited,
+            'degraded': any(item.get('degraded') or item.get('template_reply') for item in processed_emails),
             'remaining_unread': max(0, total_unread_count - len(emails_to_process))
         }
     
+    def _process_email(self, email: Dict, auto_reply_allowed: bool = True, defer_draft: bool = False) -> Dict:
+        """Classify, draft and (if appropriate) auto-reply to a single email"""
+        try:
+            print(f"Processing email: {email['subject'][:50]}...")
+            
+            sender_email = self._extract_email_address(email['sender'])
+            
+            # Bounces and auto-responders never get a reply; skip the LLM calls entirely
+            if is_auto_generated(email, sender_email):
+                self.sender_index.record_email(sender_email, None)
+                return {
+                    'email': email,
+                    'suggested_reply': '',
+                    'auto_reply_sent': False,
+                    'auto_reply_blocked': 'auto_generated',
+                    'category': self.sender_index.known_category(sender_email) or 'notification'
+                }
+            
+            fingerprint = preferences_fingerprint(self.user_preferences)
+            precomputed = self.draft_cache.get(email.get('message_id'), fingerprint)
+            if precomputed:
+                category, trusted = precomputed['category'], True
+            else:
+                category, trusted = self._categorize(email, sender_email)
+            # A keyword-rule guess is not written to the indexes the sender history is built from
+            recorded_category = category if trusted else None
+            self.search_index.add_message(email, recorded_category)
+            
+            # Check if should auto-reply
+            should_auto_reply = (
+                trusted and
+                auto_reply_allowed and
+                self.user_preferences.get('auto_reply_enabled', False) and
+                self._should_auto_reply(email, sender_email, category)
+            )
+            # Dedup checks come before drafting; a blocked email is left for the human
+            blocked_reason = self.sent_log.blocked_reason(email, sender_email) if should_auto_reply else None
+            if blocked_reason:
+                print(f"Auto-reply suppressed ({blocked_reason}) for {sender_email}")
+                should_auto_reply = False
+            
+            # Mail waiting for a human can have its draft generated off-peak
+            if defer_draft and not should_auto_reply and not precomputed:
+                self.scheduler.deferred.enqueue(email, category, self.scheduler.priority(email, sender_email))
+                self.sender_index.record_email(sender_email, recorded_category)
+                if trusted:
+                    self.header_index.set_category(email.get('message_id'), category)
+                return {
+                    'email': email,
+                    'suggested_reply': '',
+                    'auto_reply_sent': False,
+                    'draft_deferred': True,
+                    'category': category,
+                    'degraded': not trusted
+                }
+            
+            # Generate reply, unless it was precomputed in the background
+            if precomputed:
+                suggested_reply = precomputed['suggested_reply']
+            else:
+                suggested_reply = self.gemini_service.generate_reply(
+                    email, self.user_preferences, category=category
+                )
+                # Keep the draft shown on the dashboard so "Send Suggested" sends the same text
+                if trusted and not self.gemini_service.is_queued_for_replay(email):
+                    self.draft_cache.put(email.get('message_id'), fingerprint, category, suggested_reply)
+            # A template written while Gemini was down is shown for review, never sent on its own
+            template_reply = not precomputed and self.gemini_service.is_queued_for_replay(email)
+            if template_reply:
+                should_auto_reply = False
+            
+            email_result = {
+                'email': email,
+                'suggested_reply': suggested_reply,
+                'auto_reply_sent': False,
+                'precomputed': bool(precomputed),
+                'category': category,
+                'degraded': not trusted,
+                'template_reply': template_reply
+            }
+            if blocked_reason:
+                email_result['auto_reply_blocked'] = blocked_reason
+                # A bloom filter hit may be a false positive, so the email is still shown
+                email_result['already_replied'] = blocked_reason == 'message_already_replied'
+            
+            # Send auto-reply if enabled and appropriate; the lease may have been lost mid-run
+            if should_auto_reply and self.owns_mailbox():
+                if self.email_client.send_reply(
+                    sender_email, 
+                    email['subject'], 
+                    suggested_reply
+                ):
+                    email_result['auto_reply_sent'] = True
+                    self.sent_log.record(email, sender_email)
+                    self.search_index.add_reply(email, suggested_reply)
+                    self.draft_cache.discard(email.get('message_id'))
+                    self.gemini_service.discard_replay(email)
+                    self.sender_index.record_reply(sender_email)
+                    
+                    # Archive if configured; marked read with the rest of the run
+                    if Config.ARCHIVE_AUTO_REPLIED and email.get('uid'):
+                        self.mailbox_actions.archive(email['uid'])
+            
+            # Only known categories become labels; free-text model answers would create new ones
+            if (trusted and category in KNOWN_CATEGORIES and self.owns_mailbox() and
+                    Config.CATEGORY_LABEL_PREFIX and email.get('uid')):
+                self.mailbox_actions.add_labels(email['uid'], f"{Config.CATEGORY_LABEL_PREFIX}/{category}")
+            if self.mailbox_actions.should_flush:
+                self.flush_mailbox_actions()
+            
+            self.sender_index.record_email(sender_email, recorded_category)
+            if trusted:
+                self.header_index.set_category(email.get('message_id'), category)
+            return email_result
+            
+        except Exception as e:
+            print(f"Error processing email '{email['subject'][:30]}...': {e}")
+            # Add basic info even if processing failed
+            return {
+                'email': email,
+                'suggested_reply': f"Error processing: {str(e)}",
+                'auto_reply_sent': False,
+                'category': 'error',
+                'error': str(e)
+            }
+    
+    def _summarize(self, emails: List[Dict]) -> str:
+        """Summary precomputed for these emails, or a fresh one"""
+        summary = self.summary_cache.get(emails)
+        if summary is None:
+            summary = self.gemini_service.summarize_emails(emails)
+        return summary
+    
+    def _mark_read(self, email: Dict):
+        """Queue the \\Seen flag for the next bulk flush; falls back to a direct STORE without a UID"""
+        if email.get('uid'):
+            self.mailbox_actions.mark_read(email['uid'])
+        else:
+            self.email_client.mark_as_read(email['id'])
+    
+    def flush_mailbox_actions(self) -> bool:
+        """Apply queued flag, label and move actions in one IMAP session; transient failures are retried later"""
+        pending = self.mailbox_actions.drain()
+        retry = self.email_client.apply_actions(pending)
+        if not any(retry.values()):
+            self.mailbox_actions.flushed()
+            return True
+        self.mailbox_actions.requeue(retry)
+        return False
+    
+    def _categorize(self, email: Dict, sender_email: str) -> Tuple[str, bool]:
+        """Category from the sender index when the sender is well known, otherwise from Gemini
+        
+        The flag is False when Gemini was unavailable and keyword rules guessed;
+        such a category is shown but never auto-replied on or recorded.
+        """
+        known_category = self.sender_index.known_category(sender_email)
+        if known_category:
+            return known_category, True
+        return self.gemini_service.classify_email(email)
+    
+    def _should_auto_reply(self, email: Dict, sender_email: str, category: str) -> bool:
+        """Auto-reply decision, honouring per-sender user overrides"""
+        override = self.sender_index.auto_reply_override(sender_email)
+        if override is not None:
+            return override
+        return self.gemini_service.should_auto_reply(email, category=category)
+    
+    def _prioritize(self, emails: List[Dict]) -> List[Dict]:
+        """Order emails so latency-sensitive mail is handled first"""
+        return sorted(
+            emails,
+            key=lambda email: self.scheduler.priority(email, self._extract_email_address(email['sender'])),
+            reverse=True
+        )
+    
+    def run_deferred_work(self) -> int:
+        """Generate a batch of deferred drafts when the scheduler allows it"""
+        if not self.scheduler.should_run_deferred() or self.gemini_service.degraded:
+            return 0
+        self.refresh_shared_state()
+        
+        generated = 0
+        for entry in self.scheduler.deferred.pending(self.scheduler.config.SCHEDULER_BATCH_SIZE):
+            try:
+                draft = self.gemini_service.generate_reply(
+                    entry['email'], self.user_preferences, category=entry['category']
+                )
+                if self.gemini_service.is_queued_for_replay(entry['email']):
+                    # Template fallback; leave it pending for a later batch instead
+                    self.gemini_service.discard_replay(entry['email'])
+                    break
+                self.scheduler.deferred.complete(entry['email'], draft)
+                generated += 1
+            except Exception as e:
+                print(f"Error generating deferred draft: {e}")
+        
+        self.scheduler.deferred.save()
+        if generated:
+            print(f"Generated {generated} deferred drafts")
+        return generated
+    
+    def precompute_drafts(self) -> int:
+        """Classify and draft unread mail ahead of time so /process can serve cached results"""
+        if self.gemini_service.degraded:
+            return 0
+        self.refresh_shared_state()
+        
+        fingerprint = preferences_fingerprint(self.user_preferences)
+        # Peek so precomputing does not mark anything as read
+        unread_emails = self.email_client.get_unread_emails(limit=self.max_emails_to_process, peek=True)
+        
+        precomputed = 0
+        for email in unread_emails:
+            message_id = email.get('message_id')
+            if not message_id or self.draft_cache.get(message_id, fingerprint):
+                continue
+            try:
+                sender_email = self._extract_email_address(email['sender'])
+                if is_auto_generated(email, sender_email) or self.sent_log.already_replied(email, sender_email):
+                    continue
+                category, trusted = self._categorize(email, sender_email)
+                if not trusted:
+                    break  # Gemini is failing; leave the rest for /process or the next round
+                suggested_reply = self.gemini_service.generate_reply(
+                    email, self.user_preferences, category=category
+                )
+                if self.gemini_service.is_queued_for_replay(email):
+                    break  # Don't cache template fallbacks; the replay will fill it in
+                self.draft_cache.put(message_id, fingerprint, category, suggested_reply)
+                precomputed += 1
+            except Exception as e:
+                print(f"Error precomputing draft for '{email['subject'][:30]}...': {e}")
+        
+        self.draft_cache.save()
+        if precomputed:
+            print(f"Precomputed {precomputed} drafts")
+        
+        # The summary /process shows for the same unread mail
+        if unread_emails and not self.gemini_service.degraded and self.summary_cache.get(unread_emails) is None:
+            try:
+                self.summary_cache.put(unread_emails, self.gemini_service.summarize_emails(unread_emails, fallback=False))
+                self.summary_cache.save()
+            except Exception as e:
+                print(f"Error precomputing summary: {e}")
+        return precomputed
+    
+    def replay_degraded_work(self) -> int:
+        """Regenerate replies that were answered from templates during a Gemini outage"""
+        fingerprint = preferences_fingerprint(self.user_preferences)
+        
+        def store_draft(email: Dict, category: str, reply: str):
+            self.draft_cache.put(email.get('message_id'), fingerprint, category, reply)
+        
+        replayed = self.gemini_service.replay_queued(store_draft, self.user_preferences)
+        if replayed:
+            self.draft_cache.save()
+            print(f"Replayed {replayed} replies after Gemini recovered")
+        return replayed
+    
+    def get_deferred_drafts(self) -> List[Dict]:
+        """Drafts generated off-peak that are waiting for review"""
+        return [
+            {'email': entry['email'], 'category': entry['category'], 'suggested_reply': entry['draft']}
+            for entry in self.scheduler.deferred.ready()
+        ]
+    
+    def owns_mailbox(self) -> bool:
+        """Whether this worker holds the mailbox lease and may send auto-replies (never acquires it)"""
+        return self.mailbox_lease.held
+    
+    def claim_mailbox(self) -> bool:
+        """Try to take the mailbox lease; only the polling loop calls this, so ownership can fail over"""
+        return self.mailbox_lease.acquire()
+    
     def _get_total_unread_count(self) -> int:
         """Get total count of unread emails without fetching full content"""
         try:
@@ -140,7 +420,8 @@ class EmailAgent:
         """Process the next batch of emails, skipping the first 'skip_count' emails"""
         # This would require modifying email_client to support offset/skip
         # For now, we'll implement a simple version
-        unread_emails = self.email_client.get_unread_emails(limit=skip_count + self.max_emails_to_process)
+        unread_emails = self.email_client.get_unread_emails(limit=skip_count + self.max_emails_to_process, peek=True)
+        self.refresh_shared_state()
         
         if len(unread_emails) <= skip_count:
             return {
@@ -160,47 +441,20 @@ class EmailAgent:
         # Process this batch (reuse the same logic as process_inbox)
         processed_emails = []
         auto_replies_sent = 0
+        auto_reply_allowed = self.owns_mailbox()
         
         for email in emails_to_process:
-            try:
-                print(f"Processing email: {email['subject'][:50]}...")
-                
-                suggested_reply = self.gemini_service.generate_reply(
-                    email, self.user_preferences
-                )
-                
-                should_auto_reply = (
-                    self.user_preferences.get('auto_reply_enabled', False) and
-                    self.gemini_service.should_auto_reply(email)
-                )
-                
-                email_result = {
-                    'email': email,
-                    'suggested_reply': suggested_reply,
-                    'auto_reply_sent': False,
-                    'category': self.gemini_service.categorize_email(email)
-                }
-                
-                if should_auto_reply:
-                    sender_email = self._extract_email_address(email['sender'])
-                    if self.email_client.send_reply(sender_email, email['subject'], suggested_reply):
-                        email_result['auto_reply_sent'] = True
-                        auto_replies_sent += 1
-                        self.email_client.mark_as_read(email['id'])
-                
-                processed_emails.append(email_result)
-                
-            except Exception as e:
-                print(f"Error processing email: {e}")
-                processed_emails.append({
-                    'email': email,
-                    'suggested_reply': f"Error processing: {str(e)}",
-                    'auto_reply_sent': False,
-                    'category': 'error',
-                    'error': str(e)
-                })
+            email_result = self._process_email(email, auto_reply_allowed)
+            if email_result['auto_reply_sent']:
+                auto_replies_sent += 1
+            if auto_reply_allowed:
+                self._mark_read(email)
+            processed_emails.append(email_result)
+        
+        self.flush_mailbox_actions()
+        self.draft_cache.save()
         
-        summary = self.gemini_service.summarize_emails(emails_to_process)
+        summary = self._summarize(emails_to_process)
         
         return {
             'summary': summary,
@@ -209,20 +463,48 @@ class EmailAgent:
             'total_unread': len(unread_emails),
             'processed_count': len(emails_to_process),
             'batch_start': skip_count + 1,
-            'quota_limited': True
+            'quota_limited': True,
+            'degraded': any(item.get('degraded') or item.get('template_reply') for item in processed_emails)
         }
     
-    def send_manual_reply(self, email_id: str, reply_text: str) -> bool:
-        """Send a manually crafted reply"""
-        # Find the email by ID from a limited set
-        unread_emails = self.email_client.get_unread_emails(limit=50)  # Reasonable limit for finding specific email
-        target_email = None
+    def sync_headers(self) -> int:
+        """Pull new message headers and read-state into the local header index"""
+        return self.email_client.sync_headers(self.header_index)
+    
+    def browse_emails(self, **filters) -> Dict:
+        """Page through indexed headers without touching IMAP or Gemini"""
+        return self.header_index.page(**filters)
+    
+    def search_emails(self, query: str, **filters) -> List[Dict]:
+        """Full-text search over processed mail and sent replies"""
+        return self.search_index.search(query, **filters)
+    
+    def download_attachment(self, uid: int, part: str, encoding: str = 'base64'):
+        """Fetch one attachment by message UID and IMAP part number into a SpilledPart"""
+        return self.email_client.download_attachment(uid, part, encoding)
+    
+    def _find_email(self, email_id: str, uid: Optional[int] = None) -> Optional[Dict]:
+        """Look an email up by UID if known, otherwise by ID among recent unread mail
         
-        for email in unread_emails:
+        Mail handled by an unattended run is already marked read, so deferred
+        drafts are approved by UID.
+        """
+        if uid:
+            return self.email_client.get_email_by_uid(uid)
+        # Reasonable limit for finding specific email
+        for email in self.email_client.get_unread_emails(limit=50, peek=True):
             if email['id'] == email_id:
-                target_email = email
-                break
+                return email
+        return None
+    
+    def send_manual_reply(self, email_id: str, reply_text: str, suggested_reply: Optional[str] = None,
+                          category: Optional[str] = None, uid: Optional[int] = None) -> bool:
+        """Send a manually crafted reply
         
+        When the user started from a suggested reply, sending it unchanged counts
+        as an approval and sending a modified version as an edit.
+        """
+        target_email = self._find_email(email_id, uid)
         if not target_email:
             return False
         
@@ -235,36 +517,53 @@ class EmailAgent:
         
         if success:
             # Mark as read
-            self.email_client.mark_as_read(email_id)
+            self._mark_read(target_email)
+            self.flush_mailbox_actions()
+            self.sent_log.record(target_email, sender_email)
+            self.search_index.add_reply(target_email, reply_text)
+            self.scheduler.deferred.discard(target_email)
+            self.draft_cache.discard(target_email.get('message_id'))
+            self.draft_cache.save()
+            self.scheduler.deferred.save()
+            self.sender_index.record_reply(sender_email)
             
             # Learn from user action
+            if not suggested_reply:
+                action = 'manual_reply'
+            elif reply_text.strip() == suggested_reply.strip():
+                action = 'approved'
+            else:
+                action = 'edited'
             self.gemini_service.learn_from_user_action(
                 target_email, 
-                'manual_reply', 
-                reply_text
+                action, 
+                reply_text,
+                category=category or self.sender_index.known_category(sender_email)
             )
         
         return success
     
-    def approve_suggested_reply(self, email_id: str) -> bool:
+    def approve_suggested_reply(self, email_id: str, category: Optional[str] = None,
+                                uid: Optional[int] = None) -> bool:
         """Approve and send a suggested reply"""
-        unread_emails = self.email_client.get_unread_emails(limit=50)
-        target_email = None
-        
-        for email in unread_emails:
-            if email['id'] == email_id:
-                target_email = email
-                break
-        
+        target_email = self._find_email(email_id, uid)
         if not target_email:
             return False
         
-        # Generate reply again
-        reply_text = self.gemini_service.generate_reply(
-            target_email, self.user_preferences
+        sender_email = self._extract_email_address(target_email['sender'])
+        category = category or self.sender_index.known_category(sender_email)
+        
+        # Use a precomputed or off-peak draft if there is one, otherwise generate the reply again
+        self.refresh_shared_state()
+        precomputed = self.draft_cache.get(
+            target_email.get('message_id'), preferences_fingerprint(self.user_preferences)
+        )
+        reply_text = (
+            (precomputed and precomputed['suggested_reply']) or
+            self.scheduler.deferred.draft_for(target_email) or
+            self.gemini_service.generate_reply(target_email, self.user_preferences, category=category)
         )
         
-        sender_email = self._extract_email_address(target_email['sender'])
         success = self.email_client.send_reply(
             sender_email, 
             target_email['subject'], 
@@ -272,17 +571,53 @@ class EmailAgent:
         )
         
         if success:
-            self.email_client.mark_as_read(email_id)
+            self._mark_read(target_email)
+            self.flush_mailbox_actions()
+            self.sent_log.record(target_email, sender_email)
+            self.search_index.add_reply(target_email, reply_text)
+            self.scheduler.deferred.discard(target_email)
+            self.draft_cache.discard(target_email.get('message_id'))
+            self.draft_cache.save()
+            self.scheduler.deferred.save()
+            self.sender_index.record_reply(sender_email)
             self.gemini_service.learn_from_user_action(
-                target_email, 'approved', reply_text
+                target_email, 'approved', reply_text, category=category
             )
         
         return success
     
+    def reject_suggested_reply(self, email_id: str, category: Optional[str] = None,
+                               uid: Optional[int] = None) -> bool:
+        """Dismiss a suggested reply without sending anything"""
+        target_email = self._find_email(email_id, uid)
+        if not target_email:
+            return False
+        
+        sender_email = self._extract_email_address(target_email['sender'])
+        self.scheduler.deferred.discard(target_email)
+        self.draft_cache.discard(target_email.get('message_id'))
+        self.draft_cache.save()
+        self.scheduler.deferred.save()
+        self.gemini_service.learn_from_user_action(
+            target_email, 'rejected', category=category or self.sender_index.known_category(sender_email)
+        )
+        return True
+    
     def update_preferences(self, new_preferences: Dict):
         """Update user preferences"""
-        self.user_preferences.update(new_preferences)
-        self._save_user_preferences()
+        self.preferences_store.update(new_preferences)
+        # Drafts written with the old tone/signature are stale now
+        self.draft_cache.invalidate(preferences_fingerprint(self.user_preferences))
+        self.draft_cache.save()
+    
+    def enable_auto_processing(self):
+        """Turn on the polling loop in whichever worker holds the lease (saved right away so it sees it)"""
+        self.preferences_store.update({'auto_process_enabled': True})
+        self.preferences_store.flush()
+    
+    def set_sender_override(self, sender: str, category=NOT_PROVIDED, auto_reply=NOT_PROVIDED):
+        """Pin a category and/or auto-reply choice for a sender; omitted fields are left as they are"""
+        self.sender_index.set_override(self._extract_email_address(sender), category, auto_reply)
     
     def set_processing_limit(self, limit: int):
         """Update the maximum number of emails to process"""
@@ -300,6 +635,13 @@ class EmailAgent:
         return {
             'preferences': self.user_preferences,
             'max_emails_to_process': self.max_emails_to_process,
+            'known_senders': len(self.sender_index),
+            'indexed_emails': self.header_index.count(),
+            'precomputed_drafts': len(self.draft_cache),
+            'gemini_circuits': self.gemini_service.router.circuit_states(),
+            'queued_for_replay': len(self.gemini_service.replay_queue),
+            'models': self.gemini_service.router.stats(),
+            'search_documents': self.search_index.count(),
             'last_processed': 'Not implemented yet',
             'total_processed': 'Not implemented yet',
             'auto_reply_rate': 'Not implemented yet'
@@ -4,18 +4,48 @@ import email
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import decode_header
+from email.utils import parsedate_to_datetime
 import ssl
 from typing import List, Dict, Optional
 import os
 import re
+import threading
+import time
 from config import Config
+from mailbox_actions import ACTION_KINDS, uid_set
+from mime_parts import (
+    SpilledPart, PartDecoder, parse_fetch_response, walk_bodystructure, pick_body_part, decode_text,
+    PART_PATTERN, TRANSFER_ENCODINGS
+)
 
 
+# Headers kept on fetched messages for auto-reply loop detection
+LOOP_HEADERS = ('Auto-Submitted', 'X-Autoreply', 'X-Autorespond', 'X-Auto-Response-Suppress', 'Precedence')
+
+FETCH_UID_PATTERN = re.compile(rb'UID (\d+)')
+FETCH_FLAGS_PATTERN = re.compile(rb'FLAGS \(([^)]*)\)')
+
 class EmailClient:
     def __init__(self):
         self.config = Config()
-        self.imap_connection = None
-        self.smtp_connection = None
+        # Request threads and the background loops share one client; each thread gets its own connections
+        self._local = threading.local()
+
+    @property
+    def imap_connection(self):
+        return getattr(self._local, 'imap_connection', None)
+
+    @imap_connection.setter
+    def imap_connection(self, connection):
+        self._local.imap_connection = connection
+
+    @property
+    def smtp_connection(self):
+        return getattr(self._local, 'smtp_connection', None)
+
+    @smtp_connection.setter
+    def smtp_connection(self, connection):
+        self._local.smtp_connection = connection
 
     def connect_imap(self):
         """Connect to IMAP server"""
@@ -139,8 +169,8 @@ class EmailClient:
                 return match.group(1)
         return email_string.strip()
         
-    def get_unread_emails(self, limit: int = 10) -> List[Dict]:
-        """Fetch unread emails"""
+    def get_unread_emails(self, limit: int = 10, peek: bool = False) -> List[Dict]:
+        """Fetch unread emails (peek=True leaves them unread)"""
         if not self.connect_imap():
             return []
             
@@ -160,31 +190,12 @@ class EmailClient:
                 
                 for email_id in email_ids:
                     try:
-                        status, msg_data = self.imap_connection.fetch(email_id, '(RFC822)')
-                        if status == 'OK' and msg_data[0] is not None:
-                            email_body = msg_data[0][1]
-                            email_message = email.message_from_bytes(email_body)
-                            
-                            # Decode The Subject
-                            subject_header = email_message.get("Subject", "")
-                            if subject_header:
-                                subject = decode_header(subject_header)[0][0]
-                                if isinstance(subject, bytes):
-                                    subject = subject.decode('utf-8', errors='ignore')
-                            else:
-                                subject = "No Subject"
-                            
-                            # Get email content
-                            body = self._extract_email_body(email_message)
-                            
-                            emails.append({
-                                'id': email_id.decode(),
-                                'subject': subject,
-                                'sender': email_message.get("From", "Unknown"),
-                                'body': body,
-                                'date': email_message.get("Date", "Unknown"),
-                                'message_id': email_message.get("Message-ID", "")
-                            })
+                        if self.config.LAZY_FETCH:
+                            email_data = self._fetch_lazy(email_id, peek)
+                        else:
+                            email_data = self._fetch_full(email_id, peek)
+                        if email_data:
+                            emails.append(email_data)
                             
                     except Exception as e:
                         print(f"Error processing email {email_id}: {e}")
@@ -204,6 +215,139 @@ class EmailClient:
         
         return emails
 
+    def get_email_by_uid(self, uid: int) -> Optional[Dict]:
+        """Fetch one INBOX message by UID, read or unread, without changing its flags"""
+        if not self.connect_imap():
+            return None
+        try:
+            self.imap_connection.select('INBOX')
+            # SEARCH UID maps the UID to the sequence number the fetch helpers take
+            status, messages = self.imap_connection.search(None, 'UID', str(int(uid)))
+            if status != 'OK' or not messages[0]:
+                return None
+            email_id = messages[0].split()[0]
+            if self.config.LAZY_FETCH:
+                return self._fetch_lazy(email_id, peek=True)
+            return self._fetch_full(email_id, peek=True)
+        except Exception as e:
+            print(f"Error fetching email UID {uid}: {e}")
+            return None
+        finally:
+            if self.imap_connection:
+                try:
+                    self.imap_connection.close()
+                    self.imap_connection.logout()
+                except:
+                    pass
+
+    def _email_dict(self, email_id: bytes, email_message, body: str) -> Dict:
+        """Build the email dict handed to the agent from parsed headers and body text"""
+        return {
+            'id': email_id.decode(),
+            'subject': self._decode_subject(email_message),
+            'sender': email_message.get("From", "Unknown"),
+            'body': body,
+            'date': email_message.get("Date", "Unknown"),
+            'message_id': email_message.get("Message-ID", ""),
+            'in_reply_to': email_message.get("In-Reply-To", ""),
+            'references': email_message.get("References", ""),
+            'loop_headers': {
+                name: str(email_message[name])
+                for name in LOOP_HEADERS if email_message[name] is not None
+            }
+        }
+
+    def _fetch_full(self, email_id: bytes, peek: bool = False) -> Optional[Dict]:
+        """Fetch and parse the complete RFC822 message"""
+        status, msg_data = self.imap_connection.fetch(email_id, '(UID BODY.PEEK[])' if peek else '(UID RFC822)')
+        if status != 'OK' or msg_data[0] is None:
+            return None
+        email_message = email.message_from_bytes(msg_data[0][1])
+        email_data = self._email_dict(email_id, email_message, self._extract_email_body(email_message))
+        uid_match = FETCH_UID_PATTERN.search(msg_data[0][0])
+        email_data['uid'] = int(uid_match.group(1)) if uid_match else None
+        return email_data
+
+    def _fetch_lazy(self, email_id: bytes, peek: bool = False) -> Optional[Dict]:
+        """Fetch BODYSTRUCTURE and headers, then only a bounded prefix of the body text.
+
+        Attachments are returned as lazy handles (uid, part, name, size, type)
+        and downloaded on demand with download_attachment.
+        """
+        # BODY[HEADER] (not PEEK) flags the message \Seen like the RFC822 fetch, unless peeking
+        header_item = 'BODY.PEEK[HEADER]' if peek else 'BODY[HEADER]'
+        status, msg_data = self.imap_connection.fetch(email_id, f'(UID BODYSTRUCTURE {header_item})')
+        if status != 'OK' or msg_data[0] is None:
+            return None
+        items = parse_fetch_response(msg_data)
+        email_message = email.message_from_bytes(items.get('BODY[HEADER]') or b'')
+        body_part, attachments = pick_body_part(walk_bodystructure(items.get('BODYSTRUCTURE') or []))
+
+        body = "No readable content"
+        if body_part:
+            status, part_data = self.imap_connection.fetch(
+                email_id, f'(BODY.PEEK[{body_part.part}]<0.{self.config.LAZY_BODY_MAX_BYTES}>)'
+            )
+            if status == 'OK':
+                raw = self._part_payload(part_data)
+                text = decode_text(raw, body_part.encoding, body_part.params.get('charset')).strip()
+                body = text or body
+        
+        email_data = self._email_dict(email_id, email_message, body)
+        email_data['uid'] = int(items['UID']) if items.get('UID') else None
+        email_data['attachments'] = [part.to_dict(email_data['uid']) for part in attachments]
+        return email_data
+
+    def _part_payload(self, part_data) -> bytes:
+        """Extract the BODY[...] literal from a partial FETCH response"""
+        for name, value in parse_fetch_response(part_data).items():
+            if name.startswith('BODY[') and isinstance(value, bytes):
+                return value
+        return b''
+
+    def download_attachment(self, uid: int, part: str, encoding: str = 'base64') -> Optional[SpilledPart]:
+        """Stream one body part in fixed-size chunks into a SpilledPart (caller must close it).
+
+        Addressed by UID, which stays valid after other messages are expunged,
+        unlike the sequence number the handle was fetched with.
+        """
+        if not PART_PATTERN.match(part or '') or encoding not in TRANSFER_ENCODINGS:
+            raise ValueError(f"Invalid body part {part!r} or encoding {encoding!r}")
+        if not self.connect_imap():
+            return None
+
+        chunk_size = self.config.LAZY_CHUNK_BYTES
+        spilled = SpilledPart(self.config.LAZY_SPILL_BYTES)
+        decoder = PartDecoder(encoding)
+        offset = 0
+        try:
+            self.imap_connection.select('INBOX', readonly=True)
+            while True:
+                status, part_data = self.imap_connection.uid(
+                    'fetch', str(int(uid)), f'(BODY.PEEK[{part}]<{offset}.{chunk_size}>)'
+                )
+                # A UID that no longer exists yields OK with no data
+                if status != 'OK' or not part_data or part_data[0] is None:
+                    raise RuntimeError(f"UID FETCH failed for part {part}")
+                chunk = self._part_payload(part_data)
+                spilled.write(decoder.feed(chunk))
+                offset += len(chunk)
+                if len(chunk) < chunk_size:
+                    break
+            spilled.write(decoder.finish())
+            return spilled
+        except Exception as e:
+            print(f"Error downloading attachment {part} of UID {uid}: {e}")
+            spilled.close()
+            return None
+        finally:
+            if self.imap_connection:
+                try:
+                    self.imap_connection.close()
+                    self.imap_connection.logout()
+                except:
+                    pass
+
     def _extract_email_body(self, email_message) -> str:
         """Extract plain text body from email"""
         body = ""
@@ -253,6 +397,99 @@ class EmailClient:
                 except:
                     pass
 
+    def _quote(self, name: str) -> str:
+        """Quote a mailbox or label name; system names like \\Inbox stay atoms"""
+        if name.startswith('\\'):
+            return name
+        return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    def _uid_command(self, command: str, *args):
+        status, data = self.imap_connection.uid(command, *args)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID {command} failed: {data}")
+        return data
+
+    def apply_actions(self, actions: Dict) -> Dict:
+        """Apply drained MailboxActions in one IMAP session, one UID command per flag, label or target mailbox.
+
+        Moves run last so flags and labels land before messages leave INBOX.
+        Without the MOVE extension messages are copied, flagged \\Deleted and
+        removed with UID EXPUNGE. Without UIDPLUS they stay flagged \\Deleted:
+        a plain EXPUNGE would also remove messages someone else deleted.
+
+        Returns the actions to retry, in the same shape: groups cut off by a
+        connection problem and everything after them. Groups the server rejects
+        (NO/BAD) are logged and dropped, since retrying cannot help. A move whose
+        COPY went through but whose delete did not comes back as a 'delete'
+        group, so the copy is never repeated.
+        """
+        retry = {}
+        groups = [(kind, target, uids) for kind in ACTION_KINDS
+                  for target, uids in actions.get(kind, {}).items() if uids]
+        if not groups:
+            return retry
+        if not self.connect_imap():
+            return actions
+
+        def keep(kind, target, uids):
+            retry.setdefault(kind, {}).setdefault(target, set()).update(uids)
+
+        try:
+            self.imap_connection.select('INBOX')
+            capabilities = self._capabilities()
+        except (imaplib.IMAP4.error, OSError) as e:
+            print(f"Error applying mailbox actions: {e}")
+            self._logout()
+            return actions
+
+        for index, (kind, target, uids) in enumerate(groups):
+            message_set = uid_set(uids)
+            copied = False
+            try:
+                if kind == 'add_flags':
+                    self._uid_command('STORE', message_set, '+FLAGS.SILENT', f'({target})')
+                elif kind == 'remove_flags':
+                    self._uid_command('STORE', message_set, '-FLAGS.SILENT', f'({target})')
+                elif kind == 'add_labels':
+                    if 'X-GM-EXT-1' not in capabilities:
+                        print(f"Server does not support X-GM-LABELS, skipping label {target}")
+                        continue
+                    self._uid_command('STORE', message_set, '+X-GM-LABELS', f'({self._quote(target)})')
+                elif kind == 'move' and 'MOVE' in capabilities:
+                    self._uid_command('MOVE', message_set, self._quote(target))
+                else:
+                    if kind == 'move':
+                        self._uid_command('COPY', message_set, self._quote(target))
+                        copied = True
+                    self._uid_command('STORE', message_set, '+FLAGS.SILENT', '(\\Deleted)')
+                    if 'UIDPLUS' in capabilities:
+                        self._uid_command('EXPUNGE', message_set)
+                    else:
+                        print(f"Server does not support UIDPLUS, leaving UIDs {message_set} flagged \\Deleted")
+            except (imaplib.IMAP4.abort, OSError) as e:
+                # Connection trouble: this group and everything after it are retried later
+                print(f"Mailbox actions interrupted at {kind} {target}: {e}")
+                if copied:
+                    keep('delete', 'INBOX', uids)
+                else:
+                    keep(kind, target, uids)
+                for later_kind, later_target, later_uids in groups[index + 1:]:
+                    keep(later_kind, later_target, later_uids)
+                break
+            except imaplib.IMAP4.error as e:
+                print(f"Dropping mailbox action {kind} {target} for UIDs {message_set}: {e}")
+
+        self._logout()
+        return retry
+
+    def _logout(self):
+        if self.imap_connection:
+            try:
+                self.imap_connection.close()
+                self.imap_connection.logout()
+            except:
+                pass
+
     def get_all_emails(self, limit: int = 10) -> List[Dict]:
         """Fetch all emails (for testing purposes)"""
         if not self.connect_imap():
@@ -279,14 +516,7 @@ class EmailClient:
                             email_body = msg_data[0][1]
                             email_message = email.message_from_bytes(email_body)
                             
-                            # Decode The Subject
-                            subject_header = email_message.get("Subject", "")
-                            if subject_header:
-                                subject = decode_header(subject_header)[0][0]
-                                if isinstance(subject, bytes):
-                                    subject = subject.decode('utf-8', errors='ignore')
-                            else:
-                                subject = "No Subject"
+                            subject = self._decode_subject(email_message)
                             
                             emails.append({
                                 'id': email_id.decode(),
@@ -313,6 +543,129 @@ class EmailClient:
         return emails
 
 
+    def _decode_subject(self, email_message) -> str:
+        """Decode the Subject header"""
+        subject_header = email_message.get("Subject", "")
+        if not subject_header:
+            return "No Subject"
+        subject = decode_header(subject_header)[0][0]
+        if isinstance(subject, bytes):
+            subject = subject.decode('utf-8', errors='ignore')
+        return subject
+
+    def sync_headers(self, header_index, batch_size: Optional[int] = None) -> int:
+        """Bring the local header index up to date; returns the number of new messages indexed"""
+        batch_size = batch_size or self.config.HEADER_SYNC_BATCH
+        if not self.connect_imap():
+            return 0
+
+        added = 0
+        try:
+            self.imap_connection.select('INBOX', readonly=True)
+            _, validity = self.imap_connection.response('UIDVALIDITY')
+            if validity and validity[0] and header_index.check_uid_validity(validity[0].decode()):
+                print("UIDVALIDITY changed, header index rebuilt from scratch")
+
+            # Only fetch headers for UIDs we have not indexed yet
+            last_uid = header_index.last_uid()
+            status, data = self.imap_connection.uid('search', None, f'UID {last_uid + 1}:*')
+            new_uids = [uid for uid in data[0].split() if int(uid) > last_uid] if status == 'OK' and data[0] else []
+
+            for start in range(0, len(new_uids), batch_size):
+                batch = b','.join(new_uids[start:start + batch_size]).decode()
+                status, msg_data = self.imap_connection.uid(
+                    'fetch', batch, '(UID FLAGS BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE MESSAGE-ID)])'
+                )
+                if status != 'OK':
+                    continue
+
+                rows = []
+                for item in msg_data:
+                    if not isinstance(item, tuple):
+                        continue
+                    uid_match = FETCH_UID_PATTERN.search(item[0])
+                    if not uid_match:
+                        continue
+                    flags_match = FETCH_FLAGS_PATTERN.search(item[0])
+                    header_message = email.message_from_bytes(item[1])
+                    sender = header_message.get("From", "Unknown")
+                    try:
+                        date_ts = int(parsedate_to_datetime(header_message.get("Date")).timestamp())
+                    except Exception:
+                        date_ts = 0
+                    rows.append({
+                        'uid': int(uid_match.group(1)),
+                        'message_id': header_message.get("Message-ID", ""),
+                        'sender': sender,
+                        'sender_address': self._extract_email_address(sender).lower(),
+                        'subject': self._decode_subject(header_message),
+                        'date_ts': date_ts,
+                        'seen': int(bool(flags_match and b'\\Seen' in flags_match.group(1)))
+                    })
+                header_index.upsert_headers(rows)
+                added += len(rows)
+
+            self._sync_flags(header_index)
+
+            print(f"Header sync complete: {added} new messages indexed")
+        except Exception as e:
+            print(f"Error syncing headers: {e}")
+        finally:
+            if self.imap_connection:
+                try:
+                    self.imap_connection.close()
+                    self.imap_connection.logout()
+                except:
+                    pass
+
+        return added
+
+    def _sync_flags(self, header_index):
+        """Refresh read-state: only changed messages via CONDSTORE, the whole mailbox on the sweep interval"""
+        _, modseq_data = self.imap_connection.response('HIGHESTMODSEQ')
+        highest_modseq = int(modseq_data[0]) if modseq_data and modseq_data[0] else None
+        synced_modseq, swept_at = header_index.flag_sync_state()
+        now = int(time.time())
+        full_sweep = now - swept_at >= self.config.HEADER_FLAG_SWEEP_SECONDS
+
+        if full_sweep:
+            query = '(UID FLAGS)'
+        elif highest_modseq and synced_modseq and 'CONDSTORE' in self._capabilities():
+            if highest_modseq == synced_modseq:
+                return
+            query = f'(UID FLAGS) (CHANGEDSINCE {synced_modseq})'
+        else:
+            return
+
+        status, flag_data = self.imap_connection.uid('fetch', '1:*', query)
+        if status != 'OK':
+            return
+        seen_by_uid = {}
+        for line in flag_data:
+            line = line[0] if isinstance(line, tuple) else line
+            uid_match = FETCH_UID_PATTERN.search(line or b'')
+            if uid_match:
+                flags_match = FETCH_FLAGS_PATTERN.search(line)
+                seen_by_uid[int(uid_match.group(1))] = bool(flags_match and b'\\Seen' in flags_match.group(1))
+
+        if full_sweep:
+            header_index.sync_flags(seen_by_uid)
+            header_index.set_flag_sync_state(highest_modseq, swept_at=now)
+        else:
+            header_index.update_flags(seen_by_uid)
+            header_index.set_flag_sync_state(highest_modseq)
+
+    def _capabilities(self) -> set:
+        """Capabilities advertised after login; Gmail only lists MOVE, UIDPLUS and CONDSTORE once authenticated"""
+        try:
+            status, data = self.imap_connection.capability()
+            if status == 'OK' and data and data[-1]:
+                return set(data[-1].decode().upper().split())
+        except Exception as e:
+            print(f"Error reading IMAP capabilities: {e}")
+        return set(self.imap_connection.capabilities)
+
+
 # Test the connection and new functionality
 if __name__ == "__main__":
     client = EmailClient()
@@ -0,0 +1,86 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from config import Config
+
+
+USER_ACTIONS = ('approved', 'manual_reply', 'rejected', 'edited')
+
+
+class EventLog:
+    """Append-only log of user actions, stored as rotated JSON-lines segments.
+
+    Each event is one compact line with short keys:
+    t=timestamp, a=action, s=sender address, c=category, n=reply length
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.config = Config()
+        self.directory = directory or self.config.LEARNING_LOG_DIR
+        self.max_segment_bytes = self.config.LEARNING_SEGMENT_MAX_BYTES
+        self.max_segments = self.config.LEARNING_MAX_SEGMENTS
+        self._lock = threading.Lock()
+
+    def _segments(self):
+        """Segment files ordered oldest to newest"""
+        return sorted(glob.glob(os.path.join(self.directory, 'segment-*.jsonl')))
+
+    def _active_segment(self) -> str:
+        """Return the segment to append to, rotating when the current one is full"""
+        segments = self._segments()
+        if segments and os.path.getsize(segments[-1]) < self.max_segment_bytes:
+            return segments[-1]
+
+        next_index = int(os.path.basename(segments[-1])[8:-6]) + 1 if segments else 1
+        path = os.path.join(self.directory, f"segment-{next_index:06d}.jsonl")
+
+        # Drop the oldest segments beyond the retention limit
+        for old_segment in segments[:max(0, len(segments) + 1 - self.max_segments)]:
+            try:
+                os.remove(old_segment)
+            except OSError as e:
+                print(f"Error removing old log segment {old_segment}: {e}")
+        return path
+
+    def append(self, action: str, sender: str, category: Optional[str] = None,
+               reply_length: Optional[int] = None):
+        """Append a single user action event"""
+        if action not in USER_ACTIONS:
+            raise ValueError(f"Unknown user action '{action}'")
+
+        event = {
+            't': int(time.time()),
+            'a': action,
+            's': sender.strip().lower(),
+            'c': category,
+            'n': reply_length
+        }
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._active_segment(), 'a') as f:
+                    f.write(line)
+            except Exception as e:
+                print(f"Error writing learning event: {e}")
+
+    def iter_events(self) -> Iterator[Dict]:
+        """Yield every stored event, oldest first"""
+        for segment in self._segments():
+            try:
+                with open(segment, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from a crash mid-append
+                            continue
+            except OSError as e:
+                print(f"Error reading log segment {segment}: {e}")
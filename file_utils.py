@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+def atomic_write(path: str, data: Union[str, bytes], fsync: bool = False):
+    """Replace a file atomically: write a temp file next to it, then rename over it.
+
+    Readers see either the old or the new contents, never a torn write. The
+    temp file is removed if anything fails; the error is re-raised.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}-", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(data, (bytes, bytearray)) else 'w') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, obj, fsync: bool = False, **json_kwargs):
+    """Serialize obj to JSON and write it with atomic_write"""
+    atomic_write(path, json.dumps(obj, **json_kwargs), fsync=fsync)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive advisory lock on path + '.lock', held across worker processes.
+
+    Guards read-merge-write cycles on files several workers update. Where
+    fcntl is unavailable it only yields.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class JsonStateFile:
+    """Dict of JSON entries in one file shared by several worker processes.
+
+    Subclasses change entries under self._lock through _set and _delete,
+    which also record the change. refresh() re-reads the file when another
+    worker replaced it, and save() writes under file_lock; both replay this
+    worker's unsaved changes over the newest file, so keys changed by
+    different workers are all kept and the last save of a key wins.
+    """
+
+    label = 'state file'
+    fsync = False
+    json_kwargs: Dict = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._changed = {}  # key -> new entry, or None once deleted
+        self._mtime = None
+        self._entries = self._load()
+
+    def _read(self) -> Dict:
+        """Contents of the file, or an empty dict if it is missing or unreadable"""
+        try:
+            if os.path.exists(self.path):
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+                print(f"Ignoring {self.label} in {self.path}: expected an object")
+        except Exception as e:
+            print(f"Error loading {self.label} from {self.path}: {e}")
+        return {}
+
+    def _load(self) -> Dict:
+        return self._read()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _set(self, key: str, entry):
+        """Store an entry (caller holds the lock)"""
+        self._entries[key] = entry
+        self._changed[key] = entry
+
+    def _delete(self, key: str):
+        """Remove an entry, also from the file if another worker saved it (caller holds the lock)"""
+        self._entries.pop(key, None)
+        self._changed[key] = None
+
+    def _evict_oldest(self, max_entries: int, timestamp_key: str = 'created_at'):
+        """Delete the oldest entries beyond max_entries (caller holds the lock)"""
+        overflow = len(self._entries) - max_entries
+        if overflow > 0:
+            oldest = sorted(self._entries, key=lambda key: self._entries[key][timestamp_key])
+            for key in oldest[:overflow]:
+                self._delete(key)
+
+    def _merge(self):
+        """Reload the file and replay unsaved changes on top (caller holds the lock)"""
+        entries = self._load()
+        for key, entry in self._changed.items():
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+        self._entries = entries
+
+    def refresh(self):
+        """Pick up what other workers saved since the file was last read"""
+        if self._file_mtime() == self._mtime:
+            return
+        with self._lock:
+            self._merge()
+
+    def save(self):
+        """Atomically write the file if anything changed, merged with newer saves by other workers"""
+        with self._lock:
+            if not self._changed:
+                return
+            try:
+                with file_lock(self.path):
+                    if self._file_mtime() != self._mtime:
+                        self._merge()
+                    atomic_write_json(self.path, self._entries, fsync=self.fsync, **self.json_kwargs)
+                    self._mtime = self._file_mtime()
+                self._changed = {}
+            except Exception as e:
+                print(f"Error saving {self.label}: {e}")
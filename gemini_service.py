@@ -1,15 +1,44 @@
-import google.generativeai as genai
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from email.utils import parseaddr
+from typing import Callable, List, Dict, Optional, Tuple
 from config import Config
+from event_log import EventLog
+from policy_trainer import load_policies
+from circuit_breaker import CircuitBreaker
+from model_router import ModelRouter
+from degraded_mode import local_categorize, template_reply, local_summary
 
 class GeminiService:
-    def __init__(self):
+    def __init__(self, search_index=None):
         self.config = Config()
-        genai.configure(api_key=self.config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.search_index = search_index
+        self.router = ModelRouter()
+        self.event_log = EventLog()
+        self.policies = load_policies()
+        # Replies answered from templates while degraded, regenerated once Gemini recovers
+        self.replay_queue = OrderedDict()
+        self._replay_lock = threading.Lock()
         
-    def summarize_emails(self, emails: List[Dict]) -> str:
-        """Generate summary of unread emails"""
+    @property
+    def degraded(self) -> bool:
+        """True while any model's circuit is open and its calls are answered by local fallbacks"""
+        return CircuitBreaker.OPEN in self.router.circuit_states().values()
+    
+    def _generate(self, prompt: str, task: str, email: Optional[Dict] = None, category: Optional[str] = None) -> str:
+        """Call the routed model through its circuit breaker; raises on failure or open circuit"""
+        return self.router.generate(prompt, task, email, category)
+    
+    def _sender_address(self, email: Dict) -> str:
+        """Normalized sender address used as the policy key"""
+        return parseaddr(email.get('sender', ''))[1].strip().lower()
+    
+    def sender_policy(self, email: Dict) -> Dict:
+        """Learned policy for the email's sender, empty if none"""
+        return self.policies.get('senders', {}).get(self._sender_address(email), {})
+        
+    def summarize_emails(self, emails: List[Dict], fallback: bool = True) -> str:
+        """Generate summary of unread emails (fallback=False raises instead of summarizing locally)"""
         if not emails:
             return "No unread emails found."
         email_texts = []
@@ -31,13 +60,19 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self._generate(prompt, 'summarize')
         except Exception as e:
-            return f"Error generating summary: {e}"
+            if not fallback:
+                raise
+            print(f"Summary falling back to local overview: {e}")
+            return local_summary(emails)
         
     def categorize_email(self, email: Dict) -> str:
         """Categorize email for auto reply decisions"""
+        return self.classify_email(email)[0]
+        
+    def classify_email(self, email: Dict) -> Tuple[str, bool]:
+        """Category and whether the model produced it (False: local keyword fallback, not to be acted on)"""
         prompt = f"""
         Categorize this email into one of these categories:
         - calendar_invite: Meeting invitations, calendar events
@@ -57,19 +92,41 @@ class GeminiService:
         """
         
         try:
-            reponse = self.model.generate_content(prompt)
-            return reponse.text.strip().lower()
+            return self._generate(prompt, 'categorize', email).strip().lower(), True
         except Exception as e:
-            return "unknown"
+            print(f"Categorization falling back to local rules: {e}")
+            return local_categorize(email), False
         
-    def generate_reply(self, email: Dict, user_preferences: Optional[Dict]= None) -> str:
+    def generate_reply(self, email: Dict, user_preferences: Optional[Dict]= None, category: Optional[str] = None) -> str:
         """Generate appropriate email reply"""
-        category = self.categorize_email(email)
+        category = category or self.categorize_email(email)
+        prompt = self._reply_prompt(email, user_preferences, category)
+
+        try:
+            reply = self._generate(prompt, 'reply', email, category)
+        except Exception as e:
+            print(f"Reply falling back to template: {e}")
+            self._queue_replay(email, category)
+            return template_reply(category, user_preferences)
+        # A fresh reply supersedes a template queued for this email by an earlier attempt
+        self.discard_replay(email)
+        return reply
 
+    def _reply_prompt(self, email: Dict, user_preferences: Optional[Dict], category: str) -> str:
+        """Build the reply prompt for an email's category"""
         preferences_context = ""
         if user_preferences:
             preferences_context = f"User preferences: {user_preferences}"
 
+        preferred_length = (
+            self.sender_policy(email).get('preferred_reply_length') or
+            self.policies.get('categories', {}).get(category, {}).get('preferred_reply_length')
+        )
+        if preferred_length:
+            preferences_context += f"\nPreferred reply length: about {preferred_length} characters"
+        if category not in ["newsletter", "notification"]:
+            preferences_context += self._history_context(email)
+
         if category == "calendar_invite":
             prompt = f"""
             Generate a polite response to this calendar invitation:
@@ -116,26 +173,82 @@ class GeminiService:
             - Match the tone of the original email
             """
 
+        return prompt
+
+    def _history_context(self, email: Dict) -> str:
+        """Prior correspondence with the sender from the local search index, as prompt context"""
+        if not self.search_index:
+            return ""
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            related = self.search_index.related(email, limit=self.config.SEARCH_CONTEXT_MESSAGES)
         except Exception as e:
-            return f"Error generating reply: {e}"
+            print(f"Error loading correspondence history: {e}")
+            return ""
+        if not related:
+            return ""
+        lines = [
+            f"- {'You replied' if item['kind'] == 'reply' else 'They wrote'} ({(item['date'] or '')[:10]}), "
+            f"{item['subject']}: {item['snippet']}"
+            for item in related
+        ]
+        return "\nPrevious correspondence with this sender:\n" + "\n".join(lines)
+
+    def _queue_replay(self, email: Dict, category: str):
+        """Remember a template-answered email so its reply can be regenerated later"""
+        key = email.get('message_id') or email.get('id')
+        with self._replay_lock:
+            self.replay_queue[key] = (email, category)
+            self.replay_queue.move_to_end(key)
+            while len(self.replay_queue) > self.config.REPLAY_QUEUE_MAX:
+                self.replay_queue.popitem(last=False)
+
+    def is_queued_for_replay(self, email: Dict) -> bool:
+        """True if the last reply for this email came from a template"""
+        return (email.get('message_id') or email.get('id')) in self.replay_queue
 
-    def should_auto_reply(self, email: Dict) -> bool:
+    def discard_replay(self, email: Dict):
+        """Forget a queued email, e.g. once it has been answered"""
+        with self._replay_lock:
+            self.replay_queue.pop(email.get('message_id') or email.get('id'), None)
+
+    def replay_queued(self, on_reply: Callable[[Dict, str, str], None],
+                      user_preferences: Optional[Dict] = None, limit: int = 10) -> int:
+        """Regenerate queued replies with Gemini once the circuit allows calls again"""
+        if self.degraded:
+            return 0
+
+        replayed = 0
+        while replayed < limit:
+            with self._replay_lock:
+                if not self.replay_queue:
+                    break
+                key, (email, category) = self.replay_queue.popitem(last=False)
+            try:
+                reply = self._generate(self._reply_prompt(email, user_preferences, category), 'reply', email, category)
+            except Exception as e:
+                print(f"Replay stopped, Gemini still unavailable: {e}")
+                with self._replay_lock:
+                    self.replay_queue[key] = (email, category)
+                    self.replay_queue.move_to_end(key, last=False)
+                break
+            on_reply(email, category, reply)
+            replayed += 1
+        return replayed
+
+    def should_auto_reply(self, email: Dict, category: Optional[str] = None) -> bool:
         """Determine if email should receive auto-reply"""
-        category = self.categorize_email(email)
+        category = category or self.categorize_email(email)
+        # The user always approves this sender's suggested replies for this category
+        if category in self.sender_policy(email).get('auto_approve_categories', ()):
+            return True
         return category in self.config.AUTO_REPLY_CATEGORIES
     
-    def learn_from_user_action(self, email: Dict, user_action: str, user_reply: Optional[str] = None):
-        """Learn from user actions for future improvement"""
-        learning_data = {
-            'email_category': self.categorize_email(email),
-            'user_action': user_action,  # 'approved', 'rejected', 'modified'
-            'user_reply': user_reply,
-            'original_sender': email['sender'],
-            'subject_keywords': email['subject'].split()
-        }
-        
-        print(f"Learning data: {learning_data}")
-      
+    def learn_from_user_action(self, email: Dict, user_action: str, user_reply: Optional[str] = None,
+                               category: Optional[str] = None):
+        """Record a user action in the event log for the offline policy trainer"""
+        self.event_log.append(
+            user_action,  # 'approved', 'manual_reply', 'rejected', 'edited'
+            self._sender_address(email),
+            category=category,
+            reply_length=len(user_reply) if user_reply else None
+        )
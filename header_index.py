@@ -0,0 +1,197 @@
+import base64
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+from config import Config
+
+
+SORT_COLUMNS = {
+    'date': 'date_ts',
+    'sender': 'sender_address',
+    'subject': 'subject'
+}
+
+
+class HeaderIndex:
+    """Local SQLite index of mailbox headers used to browse mail without IMAP or LLM calls.
+
+    Rows are keyed by IMAP UID and kept current by EmailClient.sync_headers.
+    Pages are served with keyset (cursor) pagination on (sort column, uid),
+    so each page is an index range scan regardless of how deep the cursor is.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config()
+        self.path = path or self.config.HEADER_INDEX_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS headers (
+                    uid INTEGER PRIMARY KEY,
+                    message_id TEXT,
+                    sender TEXT,
+                    sender_address TEXT,
+                    subject TEXT,
+                    date_ts INTEGER,
+                    seen INTEGER NOT NULL DEFAULT 0,
+                    category TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_headers_date ON headers (date_ts, uid);
+                CREATE INDEX IF NOT EXISTS idx_headers_sender ON headers (sender_address, uid);
+                CREATE INDEX IF NOT EXISTS idx_headers_subject ON headers (subject, uid);
+                CREATE INDEX IF NOT EXISTS idx_headers_category ON headers (category, date_ts);
+                CREATE INDEX IF NOT EXISTS idx_headers_message_id ON headers (message_id);
+            ''')
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def check_uid_validity(self, uid_validity: str) -> bool:
+        """Reset the index if the mailbox UIDVALIDITY changed; returns True on reset"""
+        with self._lock, self._conn:
+            current = self._get_meta('uid_validity')
+            if current == uid_validity:
+                return False
+            self._conn.execute('DELETE FROM headers')
+            self._conn.execute("DELETE FROM meta WHERE key IN ('highest_modseq', 'flag_sweep_at')")
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                               ('uid_validity', uid_validity))
+            return current is not None
+
+    def last_uid(self) -> int:
+        """Highest UID already indexed"""
+        row = self._conn.execute('SELECT MAX(uid) AS uid FROM headers').fetchone()
+        return row['uid'] or 0
+
+    def upsert_headers(self, rows: Iterable[Dict]):
+        """Insert or refresh header rows, keeping any category already assigned"""
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO headers (uid, message_id, sender, sender_address, subject, date_ts, seen)
+                VALUES (:uid, :message_id, :sender, :sender_address, :subject, :date_ts, :seen)
+                ON CONFLICT(uid) DO UPDATE SET seen = excluded.seen
+            ''', list(rows))
+
+    def flag_sync_state(self) -> Tuple[Optional[int], int]:
+        """HIGHESTMODSEQ at the last flag sync and when the last full flag sweep ran"""
+        with self._lock:
+            modseq = self._get_meta('highest_modseq')
+            swept_at = self._get_meta('flag_sweep_at')
+        return (int(modseq) if modseq else None), int(swept_at or 0)
+
+    def set_flag_sync_state(self, highest_modseq: Optional[int], swept_at: Optional[int] = None):
+        """Remember how far flags are synced; swept_at is set after a full sweep"""
+        values = [('highest_modseq', str(highest_modseq) if highest_modseq else None)]
+        if swept_at is not None:
+            values.append(('flag_sweep_at', str(swept_at)))
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', values)
+
+    def update_flags(self, seen_by_uid: Dict[int, bool]):
+        """Apply read-state for the messages whose flags changed"""
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE headers SET seen = ? WHERE uid = ?',
+                                   [(int(seen), uid) for uid, seen in seen_by_uid.items()])
+
+    def sync_flags(self, seen_by_uid: Dict[int, bool]):
+        """Apply current read-state and drop rows for messages no longer in the mailbox"""
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE headers SET seen = ? WHERE uid = ?',
+                                   [(int(seen), uid) for uid, seen in seen_by_uid.items()])
+            known = [row['uid'] for row in self._conn.execute('SELECT uid FROM headers')]
+            removed = [(uid,) for uid in known if uid not in seen_by_uid]
+            self._conn.executemany('DELETE FROM headers WHERE uid = ?', removed)
+
+    def set_category(self, message_id: str, category: str):
+        """Store the category assigned while processing a message"""
+        if not message_id:
+            return
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE headers SET category = ? WHERE message_id = ?', (category, message_id))
+
+    def count(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) AS n FROM headers').fetchone()['n']
+
+    def _encode_cursor(self, value, uid: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([value, uid]).encode()).decode()
+
+    def _decode_cursor(self, cursor: str):
+        try:
+            value, uid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return value, int(uid)
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    def page(self, limit: int = 25, cursor: Optional[str] = None, sort: str = 'date', order: str = 'desc',
+             category: Optional[str] = None, sender: Optional[str] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None,
+             unread: Optional[bool] = None) -> Dict:
+        """Return one page of headers matching the filters"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        column = SORT_COLUMNS[sort]
+        comparison = '<' if order == 'desc' else '>'
+
+        clauses, params = [], []
+        if category:
+            clauses.append('category = ?')
+            params.append(category)
+        if sender:
+            clauses.append('sender_address = ?')
+            params.append(sender.strip().lower())
+        if since:
+            clauses.append('date_ts >= ?')
+            params.append(int(since.replace(tzinfo=since.tzinfo or timezone.utc).timestamp()))
+        if until:
+            clauses.append('date_ts < ?')
+            params.append(int(until.replace(tzinfo=until.tzinfo or timezone.utc).timestamp()))
+        if unread is not None:
+            clauses.append('seen = ?')
+            params.append(0 if unread else 1)
+        if cursor:
+            value, uid = self._decode_cursor(cursor)
+            clauses.append(f'({column}, uid) {comparison} (?, ?)')
+            params.extend([value, uid])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        query = f'''
+            SELECT uid, message_id, sender, sender_address, subject, date_ts, seen, category
+            FROM headers {where}
+            ORDER BY {column} {order}, uid {order}
+            LIMIT ?
+        '''
+        with self._lock:
+            rows = self._conn.execute(query, params + [limit + 1]).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'emails': [self._row_to_email(row) for row in rows],
+            'next_cursor': self._encode_cursor(rows[-1][column], rows[-1]['uid']) if has_more else None
+        }
+
+    def _row_to_email(self, row: sqlite3.Row) -> Dict:
+        return {
+            'uid': row['uid'],
+            'message_id': row['message_id'],
+            'sender': row['sender'],
+            'subject': row['subject'],
+            'date': datetime.fromtimestamp(row['date_ts'], timezone.utc).isoformat() if row['date_ts'] else None,
+            'unread': not row['seen'],
+            'category': row['category']
+        }
@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Dict, Iterable, Set
+from config import Config
+
+
+# Applied in this order; 'delete' finishes moves whose COPY already succeeded
+ACTION_KINDS = ('add_flags', 'remove_flags', 'add_labels', 'delete', 'move')
+
+
+def uid_set(uids: Iterable[int]) -> str:
+    """Compact IMAP sequence set for UIDs, e.g. [1, 2, 3, 7] -> '1:3,7'"""
+    ranges = []
+    for uid in sorted(set(uids)):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(start) if start == end else f'{start}:{end}' for start, end in ranges)
+
+
+class MailboxActions:
+    """Post-processing actions accumulated during a run and applied in bulk.
+
+    Actions are grouped by kind and target (flag, label or mailbox) so that
+    EmailClient.apply_actions issues one UID command per group instead of one
+    IMAP session per message. After a failed flush, should_flush backs off
+    exponentially so a run does not retry after every email.
+    """
+
+    def __init__(self, flush_size: int = None):
+        self.flush_size = flush_size or Config.ACTION_FLUSH_SIZE
+        self._lock = threading.Lock()
+        self._pending = self._empty()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _empty(self) -> Dict[str, Dict[str, Set[int]]]:
+        return {kind: {} for kind in ACTION_KINDS}
+
+    def _add(self, kind: str, target: str, uid):
+        with self._lock:
+            self._pending[kind].setdefault(target, set()).add(int(uid))
+
+    def add_flags(self, uid, *flags: str):
+        for flag in flags:
+            self._add('add_flags', flag, uid)
+
+    def remove_flags(self, uid, *flags: str):
+        for flag in flags:
+            self._add('remove_flags', flag, uid)
+
+    def mark_read(self, uid):
+        self.add_flags(uid, '\\Seen')
+
+    def add_labels(self, uid, *labels: str):
+        """Gmail labels (X-GM-LABELS); ignored by servers without the extension"""
+        for label in labels:
+            self._add('add_labels', label, uid)
+
+    def move(self, uid, mailbox: str):
+        self._add('move', mailbox, uid)
+
+    def archive(self, uid):
+        self.move(uid, Config.ARCHIVE_MAILBOX)
+
+    def delete(self, uid, mailbox: str = 'INBOX'):
+        """Flag \\Deleted and expunge; used to finish a COPY-based move"""
+        self._add('delete', mailbox, uid)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len({uid for targets in self._pending.values() for uids in targets.values() for uid in uids})
+
+    @property
+    def should_flush(self) -> bool:
+        return len(self) >= self.flush_size and time.monotonic() >= self._retry_at
+
+    def drain(self) -> Dict[str, Dict[str, Set[int]]]:
+        """Take every pending action, leaving the batch empty"""
+        with self._lock:
+            pending, self._pending = self._pending, self._empty()
+        return pending
+
+    def requeue(self, pending: Dict[str, Dict[str, Set[int]]]):
+        """Put back actions a flush could not apply and delay the next mid-run flush"""
+        with self._lock:
+            for kind, targets in pending.items():
+                for target, uids in targets.items():
+                    self._pending[kind].setdefault(target, set()).update(uids)
+            self._failures += 1
+            delay = min(Config.ACTION_RETRY_SECONDS * 2 ** (self._failures - 1), Config.ACTION_RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay
+
+    def flushed(self):
+        """Clear the retry backoff after a flush that applied everything"""
+        with self._lock:
+            self._failures = 0
+            self._retry_at = 0.0
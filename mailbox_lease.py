@@ -0,0 +1,199 @@
+import atexit
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+from config import Config
+
+
+class LeaseBackend(ABC):
+    """Storage for named leases; each operation must be atomic across processes"""
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take the lease if it is free, expired, or already ours"""
+
+    @abstractmethod
+    def renew(self, name: str, owner: str, ttl: float) -> bool:
+        """Extend the lease only if we still own it"""
+
+    @abstractmethod
+    def release(self, name: str, owner: str):
+        """Give the lease up if we own it"""
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Leases in a local SQLite file, shared by every worker process on one host"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.LEASE_SQLITE_FILE
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        # A fresh connection per call stays valid across threads and forks
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                         (name, owner, now + ttl))
+            conn.execute('COMMIT')
+            return True
+        finally:
+            conn.close()
+
+    def renew(self, name: str, owner: str, ttl: float) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute('UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ? AND expires_at > ?',
+                                  (time.time() + ttl, name, owner, time.time()))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self, name: str, owner: str):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+        finally:
+            conn.close()
+
+
+class RedisLeaseBackend(LeaseBackend):
+    """Leases in Redis (or any server speaking its protocol) for multi-host deployments"""
+
+    RENEW_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("LEASE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url or Config.LEASE_REDIS_URL, decode_responses=True)
+        self._renew = self.client.register_script(self.RENEW_SCRIPT)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        if self.client.set(name, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        return self.renew(name, owner, ttl)
+
+    def renew(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._renew(keys=[name], args=[owner, int(ttl * 1000)]))
+
+    def release(self, name: str, owner: str):
+        self._release(keys=[name], args=[owner])
+
+
+def create_lease_backend(name: Optional[str] = None) -> LeaseBackend:
+    """Build the backend selected by LEASE_BACKEND"""
+    name = (name or Config.LEASE_BACKEND).lower()
+    if name == 'sqlite':
+        return SQLiteLeaseBackend()
+    if name == 'redis':
+        return RedisLeaseBackend()
+    raise ValueError(f"Unknown lease backend '{name}'")
+
+
+class MailboxLease:
+    """Exclusive, heartbeated ownership of a mailbox by one worker.
+
+    Once acquired, a background heartbeat keeps renewing the lease for the
+    life of the process. If the owner dies, the lease expires after its TTL
+    and the next worker to call acquire() takes over.
+    """
+
+    def __init__(self, name: str, backend: Optional[LeaseBackend] = None, ttl: Optional[float] = None):
+        self.name = f"email-agent:lease:{name}"
+        self.backend = backend or create_lease_backend()
+        self.ttl = ttl or Config.LEASE_TTL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held = False
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._stopped = threading.Event()
+        atexit.register(self.release)
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    def acquire(self) -> bool:
+        """Acquire (or confirm) ownership; returns whether this worker owns the mailbox"""
+        with self._lock:
+            if self._held:
+                return True
+            try:
+                self._held = self.backend.acquire(self.name, self.owner, self.ttl)
+            except Exception as e:
+                print(f"Error acquiring mailbox lease: {e}")
+                self._held = False
+
+            if self._held:
+                print(f"Acquired mailbox lease {self.name} as {self.owner}")
+                self._start_heartbeat()
+            return self._held
+
+    def _start_heartbeat(self):
+        if self._heartbeat and self._heartbeat.is_alive():
+            return
+        self._stopped.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.ttl / 3):
+            with self._lock:
+                if not self._held:
+                    return
+                try:
+                    renewed = self.backend.renew(self.name, self.owner, self.ttl)
+                except Exception as e:
+                    print(f"Error renewing mailbox lease: {e}")
+                    renewed = False
+                if not renewed:
+                    # Another worker may take over; stop doing owner-only work
+                    print(f"Lost mailbox lease {self.name}")
+                    self._held = False
+                    return
+
+    def release(self):
+        """Stop heartbeating and hand the mailbox back"""
+        self._stopped.set()
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+            try:
+                self.backend.release(self.name, self.owner)
+            except Exception as e:
+                print(f"Error releasing mailbox lease: {e}")
@@ -0,0 +1,234 @@
+import base64
+import binascii
+import mmap
+import quopri
+import re
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+
+TOKEN_PATTERN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}|([^\s()"]+))')
+PART_PATTERN = re.compile(r'^\d+(\.\d+)*$')
+TRANSFER_ENCODINGS = ('base64', 'quoted-printable', '7bit', '8bit', 'binary')
+
+
+def parse_fetch_response(msg_data: List) -> Dict[str, object]:
+    """Parse an imaplib FETCH response into {item name: value}.
+
+    imaplib splits literals out into (prefix, literal) tuples; they are
+    consumed in order wherever a {n} marker appears.
+    """
+    text = b''
+    literals = []
+    for item in msg_data:
+        if isinstance(item, tuple):
+            text += item[0]
+            literals.append(item[1])
+        elif isinstance(item, bytes):
+            text += item
+
+    stack = [[]]
+    literal_iter = iter(literals)
+    for match in TOKEN_PATTERN.finditer(text):
+        opening, closing, quoted, literal, atom = match.groups()
+        if opening:
+            stack.append([])
+        elif closing:
+            if len(stack) > 1:
+                finished = stack.pop()
+                stack[-1].append(finished)
+        elif quoted is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted))
+        elif literal is not None:
+            stack[-1].append(next(literal_iter, b''))
+        elif atom is not None:
+            stack[-1].append(None if atom.upper() == b'NIL' else atom)
+
+    # Expect: <seq> (NAME value NAME value ...)
+    top = stack[0]
+    items = next((token for token in top if isinstance(token, list)), [])
+    return {
+        items[i].decode().upper(): items[i + 1]
+        for i in range(0, len(items) - 1, 2) if isinstance(items[i], bytes)
+    }
+
+
+def _text(value) -> str:
+    return value.decode('utf-8', errors='ignore') if isinstance(value, bytes) else ''
+
+
+def _params(value) -> Dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {_text(value[i]).lower(): _text(value[i + 1]) for i in range(0, len(value) - 1, 2)}
+
+
+class MimePart:
+    """A leaf body part described by BODYSTRUCTURE"""
+
+    def __init__(self, part: str, content_type: str, params: Dict[str, str], encoding: str,
+                 size: int, disposition: Optional[str] = None, disposition_params: Optional[Dict] = None):
+        self.part = part
+        self.content_type = content_type
+        self.params = params
+        self.encoding = encoding
+        self.size = size
+        self.disposition = disposition
+        self.filename = (disposition_params or {}).get('filename') or params.get('name')
+
+    @property
+    def is_attachment(self) -> bool:
+        return (
+            self.disposition == 'attachment' or
+            bool(self.filename) or
+            not self.content_type.startswith('text/')
+        )
+
+    def to_dict(self, uid: Optional[int] = None) -> Dict:
+        """Lazy attachment handle; the payload is fetched with EmailClient.download_attachment"""
+        return {
+            'uid': uid,
+            'part': self.part,
+            'name': self.filename or f"part-{self.part}",
+            'size': self.size,
+            'content_type': self.content_type,
+            'encoding': self.encoding
+        }
+
+
+def walk_bodystructure(structure: list, prefix: str = '') -> List[MimePart]:
+    """Flatten a parsed BODYSTRUCTURE into its leaf parts with IMAP part numbers"""
+    if structure and isinstance(structure[0], list):
+        parts = []
+        # Child parts come first, followed by the subtype and extension data
+        for index, child in enumerate(structure):
+            if not isinstance(child, list):
+                break
+            parts.extend(walk_bodystructure(child, f"{prefix}{index + 1}."))
+        return parts
+
+    content_type = f"{_text(structure[0])}/{_text(structure[1])}".lower()
+    try:
+        size = int(structure[6] or 0)
+    except (TypeError, ValueError, IndexError):
+        size = 0
+
+    # Extension data sits after type-specific fields: lines for text/*, envelope/body/lines for message/rfc822
+    if content_type.startswith('text/'):
+        disposition_index = 9
+    elif content_type == 'message/rfc822':
+        disposition_index = 11
+    else:
+        disposition_index = 8
+    disposition, disposition_params = None, None
+    if len(structure) > disposition_index and isinstance(structure[disposition_index], list):
+        disposition = _text(structure[disposition_index][0]).lower()
+        disposition_params = _params(structure[disposition_index][1] if len(structure[disposition_index]) > 1 else None)
+
+    return [MimePart(
+        prefix.rstrip('.') or '1',
+        content_type,
+        _params(structure[2]),
+        _text(structure[5]).lower(),
+        size,
+        disposition,
+        disposition_params
+    )]
+
+
+class PartDecoder:
+    """Incrementally decode a transfer-encoded part fed in arbitrary chunks"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._pending = b''
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.encoding == 'base64':
+            data = self._pending + re.sub(rb'\s+', b'', chunk)
+            usable = len(data) - len(data) % 4
+            self._pending = data[usable:]
+            try:
+                return base64.b64decode(data[:usable])
+            except binascii.Error:
+                return b''
+        if self.encoding == 'quoted-printable':
+            data = self._pending + chunk
+            # Keep the last partial line so soft breaks and =XX escapes are never split
+            cut = data.rfind(b'\n') + 1
+            self._pending = data[cut:]
+            return quopri.decodestring(data[:cut])
+        return chunk
+
+    def finish(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        if not pending:
+            return b''
+        if self.encoding == 'base64':
+            try:
+                return base64.b64decode(pending + b'=' * (-len(pending) % 4))
+            except binascii.Error:
+                return b''
+        if self.encoding == 'quoted-printable':
+            return quopri.decodestring(pending)
+        return pending
+
+
+class SpilledPart:
+    """Downloaded attachment payload held in a temp file and exposed through mmap.
+
+    Small payloads stay in memory; anything larger than the spill threshold
+    rolls over to disk so peak memory stays bounded by the fetch chunk size.
+    """
+
+    def __init__(self, spill_threshold: int):
+        self.spill_threshold = spill_threshold
+        self._file = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+        self._map = None
+        self.size = 0
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+
+    @property
+    def data(self):
+        """Payload as an mmap (spilled) or bytes (in memory)"""
+        if self._map is None:
+            self._file.flush()
+            if self.size > self.spill_threshold:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._file.seek(0)
+                self._map = self._file.read()
+        return self._map
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_text(data: bytes, encoding: str, charset: Optional[str]) -> str:
+    """Decode a (possibly truncated) text part"""
+    decoder = PartDecoder(encoding)
+    payload = decoder.feed(data) + decoder.finish()
+    try:
+        return payload.decode(charset or 'utf-8', errors='ignore')
+    except LookupError:
+        return payload.decode('utf-8', errors='ignore')
+
+
+def pick_body_part(parts: List[MimePart]) -> Tuple[Optional[MimePart], List[MimePart]]:
+    """Choose the part used as the email body and return the remaining attachments"""
+    body = next((p for p in parts if p.content_type == 'text/plain' and not p.is_attachment), None)
+    if body is None:
+        body = next((p for p in parts if p.content_type.startswith('text/') and not p.is_attachment), None)
+    return body, [p for p in parts if p is not body and p.is_attachment]
@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+from config import Config
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from degraded_mode import URGENT_PATTERN
+
+
+class ModelBackend(ABC):
+    """A text generation endpoint the router can send prompts to"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """Return the model's text for a prompt"""
+
+
+class GeminiBackend(ModelBackend):
+    """Gemini model, imported and configured on first use to keep startup cheap"""
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None):
+        super().__init__(model_name)
+        self.api_key = api_key or Config.GEMINI_API_KEY
+        self._model = None
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str) -> str:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model.generate_content(prompt).text
+
+
+class LocalBackend(ModelBackend):
+    """Offline stand-in model for tests and local development.
+
+    Answers with `responder(prompt)` if given, otherwise with a fixed reply.
+    """
+
+    def __init__(self, model_name: str = 'local', responder: Optional[Callable[[str], str]] = None):
+        super().__init__(model_name)
+        self.responder = responder or (lambda prompt: 'business' if 'Categorize this email' in prompt
+                                       else 'Thank you for your email.')
+
+    def generate(self, prompt: str) -> str:
+        return self.responder(prompt)
+
+
+def default_backend_factory(model_name: str) -> ModelBackend:
+    if Config.MODEL_BACKEND == 'local':
+        return LocalBackend(model_name)
+    return GeminiBackend(model_name)
+
+
+class ModelRouter:
+    """Pick a model per task and per email, and keep latency/cost stats per model.
+
+    Rules are evaluated in order; the first whose conditions all match wins.
+    Supported conditions: task, categories, min_body_chars, max_body_chars,
+    urgent. A rule without conditions acts as the default. Each model has its
+    own circuit breaker, so an outage of one model does not stop the others.
+    """
+
+    def __init__(self, rules: Optional[List[Dict]] = None,
+                 backend_factory: Callable[[str], ModelBackend] = default_backend_factory):
+        self.rules = rules if rules is not None else self._default_rules()
+        self.backend_factory = backend_factory
+        self.costs = json.loads(Config.MODEL_COSTS) if Config.MODEL_COSTS else {}
+        self._backends = {}
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _default_rules(self) -> List[Dict]:
+        if Config.MODEL_ROUTES:
+            return json.loads(Config.MODEL_ROUTES)
+        return [
+            {'task': 'categorize', 'model': Config.MODEL_FAST},
+            {'task': 'reply', 'categories': ['urgent', 'business', 'personal'], 'model': Config.MODEL_STRONG},
+            {'task': 'reply', 'min_body_chars': 2000, 'model': Config.MODEL_STRONG},
+            {'task': 'reply', 'urgent': True, 'model': Config.MODEL_STRONG},
+            {'task': 'reply', 'model': Config.MODEL_FAST},
+            {'model': Config.MODEL_STRONG}
+        ]
+
+    def _matches(self, rule: Dict, task: str, email: Optional[Dict], category: Optional[str]) -> bool:
+        if 'task' in rule and rule['task'] != task:
+            return False
+        if 'categories' in rule and category not in rule['categories']:
+            return False
+        body_chars = len(email.get('body', '')) if email else 0
+        if 'min_body_chars' in rule and body_chars < rule['min_body_chars']:
+            return False
+        if 'max_body_chars' in rule and body_chars > rule['max_body_chars']:
+            return False
+        if 'urgent' in rule:
+            urgent = category == 'urgent' or bool(email and URGENT_PATTERN.search(email.get('subject', '')))
+            if urgent != rule['urgent']:
+                return False
+        return True
+
+    def select_model(self, task: str, email: Optional[Dict] = None, category: Optional[str] = None) -> str:
+        for rule in self.rules:
+            if self._matches(rule, task, email, category):
+                return rule['model']
+        return Config.MODEL_STRONG
+
+    def _backend(self, model_name: str) -> ModelBackend:
+        with self._lock:
+            if model_name not in self._backends:
+                self._backends[model_name] = self.backend_factory(model_name)
+            return self._backends[model_name]
+
+    def _breaker(self, model_name: str) -> CircuitBreaker:
+        with self._lock:
+            if model_name not in self._breakers:
+                self._breakers[model_name] = CircuitBreaker(model_name)
+            return self._breakers[model_name]
+
+    def circuit_states(self) -> Dict[str, str]:
+        """Circuit state per model that has been called"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {model_name: breaker.state for model_name, breaker in breakers.items()}
+
+    def generate(self, prompt: str, task: str, email: Optional[Dict] = None, category: Optional[str] = None) -> str:
+        """Route a prompt to the selected model through its circuit breaker and record the call.
+
+        Raises CircuitOpenError without calling the model while its circuit is open.
+        """
+        model_name = self.select_model(task, email, category)
+        started = time.monotonic()
+        try:
+            text = self._breaker(model_name).call(self._backend(model_name).generate, prompt)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self._record(model_name, task, time.monotonic() - started, prompt, '', failed=True)
+            raise
+        self._record(model_name, task, time.monotonic() - started, prompt, text)
+        return text
+
+    def _record(self, model_name: str, task: str, seconds: float, prompt: str, text: str, failed: bool = False):
+        # Roughly four characters per token; good enough for relative cost tracking
+        input_tokens, output_tokens = len(prompt) / 4, len(text) / 4
+        input_price, output_price = self.costs.get(model_name, (0.0, 0.0))
+        with self._lock:
+            stats = self._stats.setdefault(model_name, {
+                'calls': 0, 'failures': 0, 'total_seconds': 0.0, 'estimated_cost': 0.0, 'tasks': {}
+            })
+            stats['calls'] += 1
+            stats['failures'] += int(failed)
+            stats['total_seconds'] += seconds
+            stats['estimated_cost'] += (input_tokens * input_price + output_tokens * output_price) / 1000
+            stats['tasks'][task] = stats['tasks'].get(task, 0) + 1
+
+    def stats(self) -> Dict:
+        """Per-model call counts, average latency, estimated cost and circuit state"""
+        circuits = self.circuit_states()
+        with self._lock:
+            return {
+                model_name: {
+                    'circuit': circuits.get(model_name, CircuitBreaker.CLOSED),
+                    'calls': stats['calls'],
+                    'failures': stats['failures'],
+                    'avg_latency_ms': round(stats['total_seconds'] / stats['calls'] * 1000, 1),
+                    'estimated_cost': round(stats['estimated_cost'], 6),
+                    'tasks': dict(stats['tasks'])
+                }
+                for model_name, stats in self._stats.items()
+            }
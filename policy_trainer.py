@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from collections import defaultdict
+from statistics import median
+from typing import Dict, Iterable, Optional
+from config import Config
+from file_utils import atomic_write_json
+from event_log import EventLog, USER_ACTIONS
+
+
+def _empty_stats() -> Dict:
+    stats = {action: 0 for action in USER_ACTIONS}
+    stats['lengths'] = []
+    return stats
+
+
+class PolicyTrainer:
+    """Turn the user action log into per-sender and per-category policies"""
+
+    def __init__(self, min_events: Optional[int] = None, approve_threshold: Optional[float] = None):
+        self.config = Config()
+        self.min_events = min_events or self.config.POLICY_MIN_EVENTS
+        self.approve_threshold = approve_threshold or self.config.POLICY_AUTO_APPROVE_RATE
+
+    def train(self, events: Iterable[Dict]) -> Dict:
+        """Aggregate events into policies"""
+        senders = defaultdict(_empty_stats)
+        categories = defaultdict(_empty_stats)
+        sender_categories = defaultdict(_empty_stats)
+        event_count = 0
+
+        for event in events:
+            action = event.get('a')
+            if action not in USER_ACTIONS:
+                continue
+            event_count += 1
+
+            buckets = [senders[event.get('s', '')]]
+            if event.get('c'):
+                buckets.append(categories[event['c']])
+                buckets.append(sender_categories[(event.get('s', ''), event['c'])])
+
+            for stats in buckets:
+                stats[action] += 1
+                # Only replies the user actually sent count toward preferred length
+                if event.get('n') and action in ('approved', 'manual_reply', 'edited'):
+                    stats['lengths'].append(event['n'])
+
+        # Auto-approval is earned per (sender, category): approving a sender's
+        # meeting requests says nothing about their invoices
+        auto_approve = defaultdict(list)
+        for (sender, category), stats in sender_categories.items():
+            if sender and self._auto_approve(stats):
+                auto_approve[sender].append(category)
+
+        return {
+            'trained_at': int(time.time()),
+            'event_count': event_count,
+            'senders': {
+                sender: dict(self._policy(stats), auto_approve_categories=sorted(auto_approve[sender]))
+                for sender, stats in senders.items() if sender
+            },
+            'categories': {category: self._policy(stats) for category, stats in categories.items()}
+        }
+
+    def _policy(self, stats: Dict) -> Dict:
+        """Build a policy from aggregated counts"""
+        total = sum(stats[action] for action in USER_ACTIONS)
+        return {
+            'events': total,
+            'approval_rate': round(stats['approved'] / total, 3) if total else 0.0,
+            'preferred_reply_length': int(median(stats['lengths'])) if stats['lengths'] else None
+        }
+
+    def _auto_approve(self, stats: Dict) -> bool:
+        """Whether the user approved enough suggestions, and never rejected one"""
+        total = sum(stats[action] for action in USER_ACTIONS)
+        return (
+            total >= self.min_events and
+            stats['approved'] / total >= self.approve_threshold and
+            stats['rejected'] == 0
+        )
+
+    def save(self, policies: Dict, path: Optional[str] = None):
+        """Atomically write policies to disk"""
+        atomic_write_json(path or self.config.POLICY_FILE, policies, separators=(',', ':'))
+
+
+def load_policies(path: Optional[str] = None) -> Dict:
+    """Load trained policies, returning empty policies if none exist yet"""
+    path = path or Config.POLICY_FILE
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error loading policies: {e}")
+    return {'senders': {}, 'categories': {}}
+
+
+# Run the offline trainer over the event log
+if __name__ == "__main__":
+    trainer = PolicyTrainer()
+    policies = trainer.train(EventLog().iter_events())
+    trainer.save(policies)
+
+    auto_approved = [s for s, p in policies['senders'].items() if p['auto_approve_categories']]
+    print(f"Trained on {policies['event_count']} events")
+    print(f"Senders: {len(policies['senders'])}, auto-approve: {len(auto_approved)}")
+    print(f"Categories: {len(policies['categories'])}")
@@ -0,0 +1,118 @@
+import atexit
+import os
+import re
+import threading
+from typing import Dict, Optional
+from config import Config
+from file_utils import JsonStateFile
+
+
+DEFAULT_PREFERENCES = {
+    'auto_reply_enabled': True,
+    'response_tone': 'professional',
+    'signature': 'Best regards',
+    'working_hours': {'start': 9, 'end': 17},
+    'auto_categories': ['calendar_invite', 'newsletter'],
+    'auto_process_enabled': False
+}
+
+# Expected type for every known preference key
+PREFERENCES_SCHEMA = {
+    'auto_reply_enabled': bool,
+    'response_tone': str,
+    'signature': str,
+    'working_hours': dict,
+    'auto_categories': list,
+    'auto_process_enabled': bool
+}
+
+
+class PreferencesStore(JsonStateFile):
+    """Copy-on-write preferences with atomic, debounced write-behind persistence.
+
+    Readers get the current snapshot without locking. Every update builds a new
+    dict and swaps the reference, so a snapshot handed out is never mutated.
+    """
+
+    label = 'preferences'
+    fsync = True
+    json_kwargs = {'indent': 2}
+
+    def __init__(self, account: Optional[str] = None, write_delay: Optional[float] = None):
+        self.config = Config()
+        self.write_delay = self.config.PREFERENCES_WRITE_DELAY if write_delay is None else write_delay
+        self._flush_timer = None
+        super().__init__(self._path_for(account))
+        atexit.register(self.flush)
+
+    def _path_for(self, account: Optional[str]) -> str:
+        """Resolve the preferences file, namespaced per account when one is given"""
+        if not account:
+            return self.config.PREFERENCES_FILE
+        safe_name = re.sub(r'[^A-Za-z0-9_.@-]', '_', account.strip().lower())
+        return os.path.join(self.config.PREFERENCES_DIR, f"{safe_name}.json")
+
+    def _load(self) -> Dict:
+        """Load preferences from disk, falling back to defaults for invalid fields"""
+        data = self._read()
+        preferences = dict(DEFAULT_PREFERENCES)
+        for key, value in data.items():
+            try:
+                preferences.update(self._validate({key: value}))
+            except ValueError as e:
+                print(f"Ignoring invalid preference: {e}")
+        return preferences
+
+    def _validate(self, preferences: Dict) -> Dict:
+        """Check preference values against the schema"""
+        if not isinstance(preferences, dict):
+            raise ValueError("Preferences must be an object")
+
+        for key, value in preferences.items():
+            expected = PREFERENCES_SCHEMA.get(key)
+            if expected and not isinstance(value, expected):
+                raise ValueError(f"'{key}' must be of type {expected.__name__}")
+
+        working_hours = preferences.get('working_hours')
+        if working_hours is not None:
+            start, end = working_hours.get('start'), working_hours.get('end')
+            if not all(isinstance(h, int) and 0 <= h <= 24 for h in (start, end)):
+                raise ValueError("'working_hours' needs integer 'start' and 'end' between 0 and 24")
+
+        return preferences
+
+    def snapshot(self) -> Dict:
+        """Return the current preferences; callers must treat it as read-only"""
+        return self._entries
+
+    def get(self, key: str, default=None):
+        """Read a single preference from the current snapshot"""
+        return self._entries.get(key, default)
+
+    def update(self, new_preferences: Dict):
+        """Merge new preferences into a fresh snapshot and schedule a write"""
+        validated = self._validate(new_preferences)
+        with self._lock:
+            snapshot = dict(self._entries)
+            snapshot.update(validated)
+            self._entries = snapshot
+            self._changed.update(validated)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Debounce writes so a burst of updates results in a single file write"""
+        if self.write_delay <= 0:
+            self.save()
+            return
+        if self._flush_timer:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(self.write_delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self):
+        """Write pending changes to disk immediately"""
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self.save()
@@ -0,0 +1,148 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import Config
+from degraded_mode import URGENT_PATTERN
+from file_utils import JsonStateFile
+
+
+HUMAN_CATEGORIES = ('urgent', 'personal', 'business')
+
+
+def _hour_in_window(hour: float, start: float, end: float) -> bool:
+    """Check an hour against a daily window, allowing windows that wrap past midnight"""
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class DeferredQueue(JsonStateFile):
+    """Persisted queue of human-review emails whose suggested replies are generated later.
+
+    Entries expire after DEFERRED_MAX_AGE_HOURS and the oldest are evicted
+    beyond DEFERRED_MAX_ENTRIES; only a prefix of each body is kept. Changes
+    are written in one go by save() at the end of a run.
+    """
+
+    label = 'deferred queue'
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_age_hours: Optional[float] = None):
+        self.max_entries = max_entries or Config.DEFERRED_MAX_ENTRIES
+        self.max_age = (max_age_hours or Config.DEFERRED_MAX_AGE_HOURS) * 3600
+        super().__init__(path or Config.DEFERRED_QUEUE_FILE)
+
+    def _prune(self):
+        """Drop expired entries and the oldest beyond the cap (caller holds the lock)"""
+        cutoff = time.time() - self.max_age
+        expired = [key for key, entry in self._entries.items() if entry['enqueued_at'] < cutoff]
+        overflow = len(self._entries) - len(expired) - self.max_entries
+        if overflow > 0:
+            dropped = set(expired)
+            remaining = sorted((key for key in self._entries if key not in dropped),
+                               key=lambda key: self._entries[key]['enqueued_at'])
+            expired.extend(remaining[:overflow])
+        for key in expired:
+            self._delete(key)
+
+    def _key(self, email: Dict) -> str:
+        return email.get('message_id') or f"{email.get('sender')}/{email.get('subject')}/{email.get('date')}"
+
+    def enqueue(self, email: Dict, category: str, priority: int):
+        key = self._key(email)
+        with self._lock:
+            if key in self._entries:
+                return
+            # Prompts only use the start of the body; keep the file small
+            stored = dict(email, body=(email.get('body') or '')[:Config.DEFERRED_BODY_MAX_CHARS])
+            self._set(key, {
+                'email': stored,
+                'category': category,
+                'priority': priority,
+                'enqueued_at': time.time(),
+                'draft': None
+            })
+            self._prune()
+
+    def pending(self, limit: int) -> List[Dict]:
+        """Oldest highest-priority entries still waiting for a draft"""
+        with self._lock:
+            waiting = [entry for entry in self._entries.values() if entry['draft'] is None]
+        waiting.sort(key=lambda entry: (-entry['priority'], entry['enqueued_at']))
+        return waiting[:limit]
+
+    def complete(self, email: Dict, draft: str):
+        key = self._key(email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._set(key, dict(entry, draft=draft))
+
+    def ready(self) -> List[Dict]:
+        with self._lock:
+            return [entry for entry in self._entries.values() if entry['draft'] is not None]
+
+    def draft_for(self, email: Dict) -> Optional[str]:
+        """Generated draft for this email, if there is one"""
+        with self._lock:
+            entry = self._entries.get(self._key(email))
+            return entry['draft'] if entry else None
+
+    def discard(self, email: Dict):
+        """Drop an entry once its email has been answered"""
+        with self._lock:
+            self._delete(self._key(email))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class WorkScheduler:
+    """Shape LLM load around the user's working hours.
+
+    Outside working hours, autonomous runs still triage and auto-reply right
+    away, but suggested replies for mail that needs a human are deferred and
+    generated in batches during the off-peak window (or once working hours
+    begin). During working hours, latency-sensitive mail is handled first.
+    """
+
+    def __init__(self, preferences_store, sender_index):
+        self.config = Config()
+        self.preferences_store = preferences_store
+        self.sender_index = sender_index
+        self.deferred = DeferredQueue()
+
+    def in_working_hours(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        hours = self.preferences_store.get('working_hours') or {'start': 9, 'end': 17}
+        return _hour_in_window(now.hour + now.minute / 60, hours.get('start', 9), hours.get('end', 17))
+
+    def in_off_peak(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        return _hour_in_window(now.hour + now.minute / 60,
+                               self.config.SCHEDULER_OFF_PEAK_START, self.config.SCHEDULER_OFF_PEAK_END)
+
+    def should_defer_drafts(self, interactive: bool) -> bool:
+        """Defer draft generation only for unattended runs outside working hours"""
+        return not interactive and not self.in_working_hours()
+
+    def should_run_deferred(self) -> bool:
+        """Deferred drafts are generated off-peak, or caught up once the user is back"""
+        return bool(self.deferred.pending(1)) and (self.in_off_peak() or self.in_working_hours())
+
+    def priority(self, email: Dict, sender_email: str) -> int:
+        """Cheap, local urgency score; higher is handled first"""
+        score = 0
+        if URGENT_PATTERN.search(email.get('subject', '')):
+            score += 3
+        record = self.sender_index.get(sender_email)
+        if record:
+            known_category = self.sender_index.known_category(sender_email)
+            if known_category in HUMAN_CATEGORIES:
+                score += 2
+            elif known_category in self.config.AUTO_REPLY_CATEGORIES:
+                score -= 2
+            if record.seen and record.replies / record.seen >= 0.5:
+                score += 1
+        return score
@@ -0,0 +1,124 @@
+"""Measure the full-text search index: build throughput, on-disk size and query latency.
+
+Usage:
+    python search_benchmark.py [--messages 100000] [--batch 1000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from search_index import SearchIndex
+
+COMMON_WORDS = (
+    'invoice meeting project deadline budget review contract proposal schedule update '
+    'report quarterly launch customer support ticket release design feedback travel '
+    'conference agenda hiring interview payment renewal migration outage incident '
+    'roadmap analytics dashboard security audit training workshop offsite dinner'
+).split()
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'fi', 'gu', 'he', 'ja']
+SENDERS = [f"person{i}@example{i % 50}.com" for i in range(2000)]
+
+
+def vocabulary(size: int, seed: int = 42):
+    """Common business words followed by pseudo-words, with Zipf (1/rank) cumulative weights"""
+    rng = random.Random(seed)
+    words = list(COMMON_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    cumulative, total = [], 0.0
+    for rank in range(size):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+    return words, cumulative
+
+
+WORDS, CUM_WEIGHTS = vocabulary(30000)
+
+
+def synthetic_documents(count: int, seed: int = 42):
+    """Yield index documents shaped like processed mail, with a Zipf word distribution"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    for i in range(count):
+        subject_words = rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(3, 7))
+        body_words = rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=rng.randint(40, 250))
+        address = rng.choice(SENDERS)
+        yield {
+            'message_id': f"<bench-{i}@example.com>",
+            'kind': 'reply' if i % 5 == 0 else 'received',
+            'address': address,
+            'sender': address,
+            'subject': ' '.join(subject_words).capitalize(),
+            'body': ' '.join(body_words),
+            'category': None,
+            'date_ts': now - rng.randint(0, 365 * 86400)
+        }
+
+
+def build(index: SearchIndex, messages: int, batch: int) -> float:
+    """Insert synthetic documents in batches; returns documents per second"""
+    documents = synthetic_documents(messages)
+    started = time.perf_counter()
+    written = 0
+    while written < messages:
+        chunk = [next(documents) for _ in range(min(batch, messages - written))]
+        written += index.add_documents(chunk)
+    index.optimize()
+    return written / (time.perf_counter() - started)
+
+
+def query_latencies(index: SearchIndex, queries: int, common: bool = False):
+    """Milliseconds per search and per related() lookup over random queries.
+
+    Typical queries draw words from the middle of the vocabulary; common=True
+    uses the most frequent words, which match a large share of all mail.
+    """
+    rng = random.Random(7)
+    pool = COMMON_WORDS if common else WORDS[len(COMMON_WORDS):5000]
+    search_times, related_times = [], []
+    for _ in range(queries):
+        query = ' '.join(rng.sample(pool, rng.randint(1, 3)))
+        started = time.perf_counter()
+        index.search(query, limit=20)
+        search_times.append((time.perf_counter() - started) * 1000)
+
+        email = {'sender': rng.choice(SENDERS), 'subject': query, 'message_id': '<none>'}
+        started = time.perf_counter()
+        index.related(email, limit=3)
+        related_times.append((time.perf_counter() - started) * 1000)
+    return search_times, related_times
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000, help='synthetic documents to index')
+    parser.add_argument('--batch', type=int, default=1000, help='documents per transaction')
+    parser.add_argument('--queries', type=int, default=200, help='random queries to time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = SearchIndex(os.path.join(directory, 'search_index.db'))
+        throughput = build(index, args.messages, args.batch)
+        index._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = index.size_bytes()
+
+        print(f"Indexed {index.count()} documents at {throughput:,.0f} docs/s")
+        print(f"Index size: {size / 1024 / 1024:.1f} MiB ({size / max(1, index.count()):.0f} bytes/doc)")
+        for common in (False, True):
+            search_times, related_times = query_latencies(index, args.queries, common)
+            print('Common-word queries:' if common else 'Typical queries:')
+            for label, times in (('search', search_times), ('related', related_times)):
+                print(f"{label:>10}: median {statistics.median(times):.2f} ms, "
+                      f"p95 {percentile(times, 0.95):.2f} ms, max {max(times):.2f} ms")
@@ -0,0 +1,199 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+from config import Config
+
+
+SEARCH_KINDS = ('received', 'reply')
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+# Subject words too common to say anything about which past mail is related
+CONTEXT_STOPWORDS = {'re', 'fw', 'fwd', 'the', 'and', 'for', 'you', 'your', 'with', 'from', 'this', 'that'}
+
+
+def _address(sender: str) -> str:
+    return parseaddr(sender or '')[1].strip().lower()
+
+
+def _timestamp(date_header: str) -> int:
+    try:
+        return int(parsedate_to_datetime(date_header).timestamp())
+    except Exception:
+        return int(time.time())
+
+
+def match_expression(query: str, any_term: bool = False) -> str:
+    """Turn free text into a safe FTS5 query: every word quoted, ANDed (or ORed)"""
+    terms = [f'"{token}"' for token in TOKEN_PATTERN.findall(query or '')]
+    if not terms:
+        raise ValueError('Search query must contain at least one word')
+    return (' OR ' if any_term else ' ').join(terms)
+
+
+class SearchIndex:
+    """Full-text index of processed mail and the replies sent to it.
+
+    Documents live in a plain table; an external-content FTS5 table kept in
+    sync by triggers indexes subject and body without storing them twice.
+    Each document carries the counterparty address so prior correspondence
+    with a sender can be pulled into reply prompts.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config()
+        self.path = path or self.config.SEARCH_INDEX_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    message_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    address TEXT,
+                    sender TEXT,
+                    subject TEXT,
+                    body TEXT,
+                    category TEXT,
+                    date_ts INTEGER,
+                    UNIQUE (message_id, kind)
+                );
+                CREATE INDEX IF NOT EXISTS idx_documents_address ON documents (address, date_ts);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    subject, body, content='documents', content_rowid='id', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                    INSERT INTO documents_fts (rowid, subject, body) VALUES (new.id, new.subject, new.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, subject, body)
+                    VALUES ('delete', old.id, old.subject, old.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, subject, body)
+                    VALUES ('delete', old.id, old.subject, old.body);
+                    INSERT INTO documents_fts (rowid, subject, body) VALUES (new.id, new.subject, new.body);
+                END;
+            ''')
+
+    def _document(self, email: Dict, kind: str, body: str, category: Optional[str] = None) -> Dict:
+        subject = email.get('subject', '')
+        return {
+            'message_id': email.get('message_id') or email.get('id', ''),
+            'kind': kind,
+            'address': _address(email.get('sender', '')),
+            'sender': email.get('sender', ''),
+            'subject': f"Re: {subject}" if kind == 'reply' else subject,
+            'body': (body or '')[:self.config.SEARCH_BODY_MAX_CHARS],
+            'category': category,
+            'date_ts': int(time.time()) if kind == 'reply' else _timestamp(email.get('date'))
+        }
+
+    def add_documents(self, documents: Iterable[Dict]) -> int:
+        """Insert or replace documents in one transaction; returns how many were written"""
+        documents = list(documents)
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO documents (message_id, kind, address, sender, subject, body, category, date_ts)
+                VALUES (:message_id, :kind, :address, :sender, :subject, :body, :category, :date_ts)
+                ON CONFLICT(message_id, kind) DO UPDATE SET
+                    body = excluded.body,
+                    category = COALESCE(excluded.category, documents.category)
+            ''', documents)
+        return len(documents)
+
+    def add_message(self, email: Dict, category: Optional[str] = None):
+        """Index a parsed incoming message"""
+        self.add_documents([self._document(email, 'received', email.get('body', ''), category)])
+
+    def add_reply(self, email: Dict, reply_text: str):
+        """Index a reply sent to an incoming message"""
+        self.add_documents([self._document(email, 'reply', reply_text)])
+
+    def search(self, query: str, limit: int = 20, sender: Optional[str] = None,
+               kind: Optional[str] = None) -> List[Dict]:
+        """Best-matching documents for a free-text query, ranked by BM25"""
+        if kind and kind not in SEARCH_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(SEARCH_KINDS)}")
+        clauses, params = ['documents_fts MATCH ?'], [match_expression(query)]
+        if sender:
+            clauses.append('d.address = ?')
+            params.append(_address(sender) or sender.strip().lower())
+        if kind:
+            clauses.append('d.kind = ?')
+            params.append(kind)
+
+        with self._lock:
+            rows = self._conn.execute(f'''
+                SELECT d.*, snippet(documents_fts, 1, '[', ']', '...', 16) AS snippet
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE {' AND '.join(clauses)}
+                ORDER BY bm25(documents_fts, 2.0, 1.0)
+                LIMIT ?
+            ''', params + [limit]).fetchall()
+        return [self._row_to_result(row) for row in rows]
+
+    def related(self, email: Dict, limit: int = 3) -> List[Dict]:
+        """Prior correspondence with the email's sender, most relevant to its subject first.
+
+        Candidates are the sender's most recent documents (an index range on
+        address), scored by subject-word overlap with their subject and the start
+        of their body. Full bodies are never read, and the cost depends on how much
+        mail the sender has, not on how common the subject words are.
+        """
+        address = _address(email.get('sender', ''))
+        if not address or limit <= 0:
+            return []
+        message_id = email.get('message_id') or email.get('id', '')
+        words = {word for word in TOKEN_PATTERN.findall(email.get('subject', '').lower())
+                 if len(word) > 2 and word not in CONTEXT_STOPWORDS}
+
+        with self._lock:
+            candidates = self._conn.execute('''
+                SELECT message_id, kind, sender, subject, substr(body, 1, 300) AS snippet, category, date_ts
+                FROM documents
+                WHERE address = ? AND message_id != ?
+                ORDER BY date_ts DESC
+                LIMIT ?
+            ''', (address, message_id, self.config.SEARCH_CONTEXT_CANDIDATES)).fetchall()
+
+        def score(row: sqlite3.Row) -> int:
+            subject_words = set(TOKEN_PATTERN.findall((row['subject'] or '').lower()))
+            snippet_words = set(TOKEN_PATTERN.findall((row['snippet'] or '').lower()))
+            return 2 * len(words & subject_words) + len(words & snippet_words)
+
+        # Stable sort keeps the most recent first among equally relevant documents
+        ranked = sorted(candidates, key=score, reverse=True) if words else candidates
+        return [self._row_to_result(row) for row in ranked[:limit]]
+
+    def _row_to_result(self, row: sqlite3.Row) -> Dict:
+        return {
+            'message_id': row['message_id'],
+            'kind': row['kind'],
+            'sender': row['sender'],
+            'subject': row['subject'],
+            'snippet': row['snippet'],
+            'category': row['category'],
+            'date': datetime.fromtimestamp(row['date_ts'], timezone.utc).isoformat() if row['date_ts'] else None
+        }
+
+    def count(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) AS n FROM documents').fetchone()['n']
+
+    def size_bytes(self) -> int:
+        """On-disk size of the database including its WAL"""
+        return sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path))
+
+    def optimize(self):
+        """Merge FTS5 index segments; worth running after a large bulk build"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
@@ -0,0 +1,194 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import Config
+
+
+# Marks an override field the caller did not provide, so it is left unchanged
+NOT_PROVIDED = object()
+# Categories that say nothing about the sender and are not counted
+UNCOUNTED_CATEGORIES = ('unknown', 'error')
+
+
+class SenderRecord:
+    """Compact per-sender history"""
+    __slots__ = ('categories', 'seen', 'replies', 'last_interaction', 'override_category', 'override_auto_reply')
+
+    def __init__(self, categories=None, seen=0, replies=0, last_interaction=0,
+                 override_category=None, override_auto_reply=None):
+        self.categories = categories or {}
+        self.seen = seen
+        self.replies = replies
+        self.last_interaction = last_interaction
+        self.override_category = override_category
+        self.override_auto_reply = override_auto_reply
+
+    def to_dict(self) -> Dict:
+        return {
+            'categories': self.categories,
+            'seen': self.seen,
+            'reply_rate': round(min(1.0, self.replies / self.seen), 3) if self.seen else 0.0,
+            'last_interaction': self.last_interaction,
+            'override_category': self.override_category,
+            'override_auto_reply': self.override_auto_reply
+        }
+
+
+class SenderIndex:
+    """SQLite sender reputation index, keyed by normalized sender address.
+
+    Every change is a single-row UPSERT committed on its own, so recording a
+    message costs the same whatever the size of the index, and all workers
+    read and write the same WAL-mode database without reloading it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config()
+        self.path = path or self.config.SENDER_INDEX_FILE
+        self.min_samples = self.config.SENDER_INDEX_MIN_SAMPLES
+        self.confidence = self.config.SENDER_INDEX_CONFIDENCE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+        self._migrate_json(os.path.splitext(self.path)[0] + '.json')
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS senders (
+                    address TEXT PRIMARY KEY,
+                    seen INTEGER NOT NULL DEFAULT 0,
+                    replies INTEGER NOT NULL DEFAULT 0,
+                    last_interaction INTEGER NOT NULL DEFAULT 0,
+                    override_category TEXT,
+                    override_auto_reply INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS sender_categories (
+                    address TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (address, category)
+                );
+            ''')
+
+    def _migrate_json(self, legacy_path: str):
+        """Import the index from the JSON file earlier versions kept, then set the file aside"""
+        if legacy_path == self.path or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                data = json.load(f)
+            with self._lock, self._conn:
+                for address, fields in data.items():
+                    record = SenderRecord(*fields)
+                    self._conn.execute('''
+                        INSERT OR IGNORE INTO senders
+                            (address, seen, replies, last_interaction, override_category, override_auto_reply)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (address, record.seen, record.replies, record.last_interaction,
+                          record.override_category, record.override_auto_reply))
+                    self._conn.executemany('''
+                        INSERT OR IGNORE INTO sender_categories (address, category, count) VALUES (?, ?, ?)
+                    ''', [(address, category, count) for category, count in record.categories.items()])
+            os.replace(legacy_path, legacy_path + '.migrated')
+            print(f"Migrated {len(data)} senders from {legacy_path}")
+        except Exception as e:
+            print(f"Error migrating sender index: {e}")
+
+    def _key(self, address: str) -> str:
+        return address.strip().lower()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) AS n FROM senders').fetchone()['n']
+
+    def get(self, address: str) -> Optional[SenderRecord]:
+        """Look up a sender's record"""
+        key = self._key(address)
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM senders WHERE address = ?', (key,)).fetchone()
+            if not row:
+                return None
+            categories = {
+                category_row['category']: category_row['count'] for category_row in self._conn.execute(
+                    'SELECT category, count FROM sender_categories WHERE address = ?', (key,)
+                )
+            }
+        auto_reply = row['override_auto_reply']
+        return SenderRecord(categories, row['seen'], row['replies'], row['last_interaction'],
+                            row['override_category'], None if auto_reply is None else bool(auto_reply))
+
+    def known_category(self, address: str) -> Optional[str]:
+        """Category to use without classification, if the sender's history is conclusive"""
+        record = self.get(address)
+        if not record:
+            return None
+        if record.override_category:
+            return record.override_category
+        if record.seen < self.min_samples or not record.categories:
+            return None
+
+        category, count = max(record.categories.items(), key=lambda item: item[1])
+        return category if count / record.seen >= self.confidence else None
+
+    def auto_reply_override(self, address: str) -> Optional[bool]:
+        """User's explicit auto-reply choice for this sender, if any"""
+        record = self.get(address)
+        return record.override_auto_reply if record else None
+
+    def record_email(self, address: str, category: Optional[str]):
+        """Record that a message from this sender was processed"""
+        key, now = self._key(address), int(time.time())
+        try:
+            with self._lock, self._conn:
+                self._conn.execute('''
+                    INSERT INTO senders (address, seen, last_interaction) VALUES (?, 1, ?)
+                    ON CONFLICT(address) DO UPDATE SET
+                        seen = seen + 1, last_interaction = MAX(last_interaction, excluded.last_interaction)
+                ''', (key, now))
+                if category and category not in UNCOUNTED_CATEGORIES:
+                    self._conn.execute('''
+                        INSERT INTO sender_categories (address, category, count) VALUES (?, ?, 1)
+                        ON CONFLICT(address, category) DO UPDATE SET count = count + 1
+                    ''', (key, category))
+        except sqlite3.Error as e:
+            print(f"Error recording sender email: {e}")
+
+    def record_reply(self, address: str):
+        """Record that a reply was sent to this sender"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute('''
+                    INSERT INTO senders (address, replies, last_interaction) VALUES (?, 1, ?)
+                    ON CONFLICT(address) DO UPDATE SET
+                        replies = replies + 1, last_interaction = MAX(last_interaction, excluded.last_interaction)
+                ''', (self._key(address), int(time.time())))
+        except sqlite3.Error as e:
+            print(f"Error recording sender reply: {e}")
+
+    def set_override(self, address: str, category=NOT_PROVIDED, auto_reply=NOT_PROVIDED):
+        """Store a user override for this sender; None clears a field, omitted fields are kept"""
+        if category is not NOT_PROVIDED and category is not None and not isinstance(category, str):
+            raise ValueError("'category' must be a string or null")
+        if auto_reply is not NOT_PROVIDED and auto_reply is not None and not isinstance(auto_reply, bool):
+            raise ValueError("'auto_reply' must be true, false or null")
+
+        fields = {}
+        if category is not NOT_PROVIDED:
+            fields['override_category'] = category or None
+        if auto_reply is not NOT_PROVIDED:
+            fields['override_auto_reply'] = auto_reply
+        if not fields:
+            return
+
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f'''
+                INSERT INTO senders (address, {', '.join(fields)}) VALUES (?{', ?' * len(fields)})
+                ON CONFLICT(address) DO UPDATE SET {assignments}
+            ''', (self._key(address), *fields.values()))
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+from config import Config
+from file_utils import atomic_write, file_lock
+
+
+# Headers that mark a message as machine-generated or ask not to be auto-replied to
+AUTO_REPLY_HEADERS = ('X-Autoreply', 'X-Autorespond', 'X-Auto-Response-Suppress')
+AUTO_REPLY_SENDERS = re.compile(r'^(mailer-daemon|postmaster|no-?reply|do-?not-?reply)@', re.IGNORECASE)
+
+
+def is_auto_generated(email: Dict, sender_email: str) -> bool:
+    """Detect auto-responders and bounces that must never get an auto-reply"""
+    headers = email.get('loop_headers', {})
+
+    auto_submitted = headers.get('Auto-Submitted', '').strip().lower()
+    if auto_submitted and auto_submitted != 'no':
+        return True
+    if any(headers.get(name) for name in AUTO_REPLY_HEADERS):
+        return True
+    if headers.get('Precedence', '').strip().lower() == 'auto_reply':
+        return True
+    return bool(AUTO_REPLY_SENDERS.match(sender_email))
+
+
+def thread_key(email: Dict) -> str:
+    """Identify the conversation a message belongs to"""
+    references = email.get('references', '').split()
+    if references:
+        return references[0]
+    if email.get('in_reply_to'):
+        return email['in_reply_to'].strip()
+    if email.get('message_id'):
+        return email['message_id'].strip()
+    return re.sub(r'^((re|fwd?)\s*:\s*)+', '', email.get('subject', ''), flags=re.IGNORECASE).strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over a bytearray"""
+
+    def __init__(self, size_bits: int, hash_count: int, bits: Optional[bytearray] = None):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SentReplyLog:
+    """Persistent record of auto-replies enforcing at most one per message, thread and sender.
+
+    Message IDs that were ever replied to live in a bloom filter, so the full
+    history costs a fixed amount of memory; a false positive only suppresses
+    an auto-reply, the email is still processed and shown. Thread and sender keys are kept exactly, but only within
+    the dedup window. Workers share the files: each follows the log for
+    entries the others append, and merges the bloom bits on disk into its own
+    before writing them back.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config()
+        self.path = path or self.config.SENT_LOG_FILE
+        self.bloom_path = self.path + '.bloom'
+        self.window = self.config.SENT_LOG_WINDOW_HOURS * 3600
+        self._lock = threading.Lock()
+        self._offset = 0
+        self.message_filter = self._load_filter()
+        with file_lock(self.path):
+            self._recent = self._load_recent()
+
+    def _load_filter(self) -> BloomFilter:
+        size_bits = self.config.SENT_LOG_BLOOM_BITS
+        hash_count = self.config.SENT_LOG_BLOOM_HASHES
+        try:
+            if os.path.exists(self.bloom_path):
+                with open(self.bloom_path, 'rb') as f:
+                    bits = bytearray(f.read())
+                if len(bits) == (size_bits + 7) // 8:
+                    return BloomFilter(size_bits, hash_count, bits)
+                print("Sent log bloom filter size changed, rebuilding")
+        except Exception as e:
+            print(f"Error loading sent log bloom filter: {e}")
+        return BloomFilter(size_bits, hash_count)
+
+    def _load_recent(self) -> Dict[str, float]:
+        """Load thread and sender keys still inside the window, compacting the log"""
+        recent = {}
+        kept_lines = []
+        entries = []
+        cutoff = time.time() - self.window
+        try:
+            if os.path.exists(self.path):
+                entries, self._offset = self._read_from(0)
+        except Exception as e:
+            print(f"Error loading sent log: {e}")
+
+        for entry in entries:
+            # Message keys also go to the filter in case the bloom file was lost
+            self.message_filter.add(entry['m'])
+            if entry['t'] >= cutoff:
+                recent[entry['h']] = recent[entry['s']] = entry['t']
+                kept_lines.append(self._entry_line(entry))
+
+        if len(entries) > len(kept_lines):
+            self._rewrite(kept_lines)
+        return recent
+
+    def _read_from(self, offset: int):
+        """Complete log entries after a byte offset, and the offset past the last of them"""
+        entries = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Still being appended; read it next time
+                    break
+                offset += len(line)
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries, offset
+
+    def refresh(self):
+        """Pick up replies other workers logged since the last look"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        with self._lock:
+            if size == self._offset:
+                return
+            if size < self._offset:
+                # Another worker compacted the log; re-reading kept entries is harmless
+                self._offset = 0
+            try:
+                entries, self._offset = self._read_from(self._offset)
+            except Exception as e:
+                print(f"Error reading sent log: {e}")
+                return
+            for entry in entries:
+                self.message_filter.add(entry['m'])
+                for key in (entry['h'], entry['s']):
+                    self._recent[key] = max(self._recent.get(key, 0), entry['t'])
+
+    def _entry_line(self, entry: Dict) -> str:
+        return json.dumps(entry, separators=(',', ':'))
+
+    def _rewrite(self, lines):
+        """Replace the log with only the entries still inside the window"""
+        data = ''.join(line + '\n' for line in lines)
+        try:
+            atomic_write(self.path, data)
+            self._offset = len(data.encode('utf-8'))
+        except Exception as e:
+            print(f"Error compacting sent log: {e}")
+
+    def _keys(self, email: Dict, sender_email: str):
+        message_key = 'm:' + (email.get('message_id') or f"{sender_email}/{email.get('subject', '')}/{email.get('date', '')}")
+        return message_key, 'h:' + thread_key(email), 's:' + sender_email.strip().lower()
+
+    def already_replied(self, email: Dict, sender_email: str) -> bool:
+        """True if this exact message was ever replied to"""
+        message_key, _, _ = self._keys(email, sender_email)
+        return message_key in self.message_filter
+
+    def blocked_reason(self, email: Dict, sender_email: str) -> Optional[str]:
+        """Why an auto-reply to this email must not be sent, or None if it may"""
+        if is_auto_generated(email, sender_email):
+            return 'auto_generated'
+
+        self.refresh()
+        message_key, thread, sender = self._keys(email, sender_email)
+        if message_key in self.message_filter:
+            return 'message_already_replied'
+
+        cutoff = time.time() - self.window
+        if self._recent.get(thread, 0) >= cutoff:
+            return 'thread_recently_replied'
+        if self._recent.get(sender, 0) >= cutoff:
+            return 'sender_recently_replied'
+        return None
+
+    def record(self, email: Dict, sender_email: str):
+        """Record a sent reply (automatic or manual)"""
+        message_key, thread, sender = self._keys(email, sender_email)
+        now = time.time()
+        entry = {'t': now, 'm': message_key, 'h': thread, 's': sender}
+
+        with self._lock:
+            self.message_filter.add(message_key)
+            self._recent[thread] = self._recent[sender] = now
+            try:
+                with file_lock(self.path):
+                    with open(self.path, 'a') as f:
+                        f.write(self._entry_line(entry) + '\n')
+                    self._merge_filter_file()
+                    # Atomic so a torn write never forces a rebuild from the compacted log
+                    atomic_write(self.bloom_path, bytes(self.message_filter.bits))
+            except Exception as e:
+                print(f"Error writing sent log: {e}")
+
+    def _merge_filter_file(self):
+        """OR the bloom bits another worker saved into ours so neither side's are lost"""
+        try:
+            with open(self.bloom_path, 'rb') as f:
+                saved = f.read()
+        except OSError:
+            return
+        bits = self.message_filter.bits
+        if len(saved) == len(bits):
+            merged = int.from_bytes(bits, 'little') | int.from_bytes(saved, 'little')
+            bits[:] = merged.to_bytes(len(bits), 'little')
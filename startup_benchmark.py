@@ -0,0 +1,86 @@
+"""Measure worker cold-start cost: import time of app.py and time to first request.
+
+Usage:
+    python startup_benchmark.py [--runs 5] [--top 15] [--profile]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+FIRST_REQUEST_SNIPPET = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(f"{(imported - start) * 1000:.2f} {(served - start) * 1000:.2f}")
+"""
+
+PROFILE_SNIPPET = """
+import cProfile, pstats
+profiler = cProfile.Profile()
+profiler.enable()
+import app
+app.app.test_client().get('/')
+profiler.disable()
+pstats.Stats(profiler).sort_stats('cumulative').print_stats({top})
+"""
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    """Run a snippet in a fresh interpreter from the project directory"""
+    return subprocess.run(
+        [sys.executable, *flags, '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+
+
+def time_to_first_request(runs: int):
+    """Median import and time-to-first-response in milliseconds over fresh processes"""
+    import_times, first_request_times = [], []
+    for _ in range(runs):
+        result = run_python(FIRST_REQUEST_SNIPPET)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip())
+        imported, served = result.stdout.split()
+        import_times.append(float(imported))
+        first_request_times.append(float(served))
+    return statistics.median(import_times), statistics.median(first_request_times)
+
+
+def slowest_imports(top: int):
+    """Parse -X importtime output into the modules with the largest cumulative cost"""
+    result = run_python('import app', '-X', 'importtime')
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = [field.strip() for field in line.split(':', 1)[1].split('|')]
+        entries.append((int(cumulative_us), int(self_us), module))
+    return sorted(entries, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes to time')
+    parser.add_argument('--top', type=int, default=15, help='number of imports/functions to list')
+    parser.add_argument('--profile', action='store_true', help='print a cProfile report of startup')
+    args = parser.parse_args()
+
+    import_ms, first_request_ms = time_to_first_request(args.runs)
+    print(f"Import app.py:          {import_ms:8.2f} ms (median of {args.runs})")
+    print(f"Time to first request:  {first_request_ms:8.2f} ms (median of {args.runs})")
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, self_us, module in slowest_imports(args.top):
+        print(f"  {cumulative_us / 1000:8.2f} ms  (self {self_us / 1000:6.2f} ms)  {module}")
+
+    if args.profile:
+        print("\nStartup profile:")
+        print(run_python(PROFILE_SNIPPET.format(top=args.top)).stdout)
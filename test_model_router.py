@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import Config
+from model_router import LocalBackend, ModelRouter
+
+
+def email(subject='Hello', body='Short message'):
+    return {'sender': 'alice@example.com', 'subject': subject, 'body': body}
+
+
+class ModelRouterTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(Config, 'MODEL_ROUTES', ''), mock.patch.object(Config, 'MODEL_COSTS', ''):
+            self.router = ModelRouter(backend_factory=LocalBackend)
+
+    def test_default_routes(self):
+        self.assertEqual(self.router.select_model('categorize', email()), Config.MODEL_FAST)
+        self.assertEqual(self.router.select_model('reply', email(), 'business'), Config.MODEL_STRONG)
+        self.assertEqual(self.router.select_model('reply', email(), 'newsletter'), Config.MODEL_FAST)
+        self.assertEqual(self.router.select_model('reply', email(body='x' * 2000), 'newsletter'), Config.MODEL_STRONG)
+        self.assertEqual(self.router.select_model('reply', email(subject='URGENT: invoice'), 'newsletter'),
+                         Config.MODEL_STRONG)
+        self.assertEqual(self.router.select_model('summarize'), Config.MODEL_STRONG)
+
+    def test_custom_rules_first_match_wins(self):
+        router = ModelRouter(rules=[
+            {'task': 'reply', 'max_body_chars': 10, 'model': 'tiny'},
+            {'model': 'big'}
+        ], backend_factory=LocalBackend)
+        self.assertEqual(router.select_model('reply', email(body='hi')), 'tiny')
+        self.assertEqual(router.select_model('reply', email()), 'big')
+
+    def test_generate_records_stats_per_model(self):
+        self.assertEqual(self.router.generate('Categorize this email', 'categorize', email()), 'business')
+        self.router.generate('Write a reply', 'reply', email(), 'business')
+        self.router.generate('Write a reply', 'reply', email(), 'business')
+
+        stats = self.router.stats()
+        self.assertEqual(stats[Config.MODEL_FAST]['calls'], 1)
+        self.assertEqual(stats[Config.MODEL_FAST]['tasks'], {'categorize': 1})
+        self.assertEqual(stats[Config.MODEL_STRONG]['calls'], 2)
+        self.assertEqual(stats[Config.MODEL_STRONG]['failures'], 0)
+        self.assertEqual(stats[Config.MODEL_STRONG]['circuit'], CircuitBreaker.CLOSED)
+
+    def test_failing_model_opens_only_its_own_circuit(self):
+        def backend(model_name):
+            if model_name == Config.MODEL_STRONG:
+                return LocalBackend(model_name, responder=mock.Mock(side_effect=RuntimeError('quota exceeded')))
+            return LocalBackend(model_name)
+        with mock.patch.object(Config, 'MODEL_ROUTES', ''):
+            router = ModelRouter(backend_factory=backend)
+
+        for _ in range(Config.BREAKER_MIN_CALLS):
+            with self.assertRaises(RuntimeError):
+                router.generate('Write a reply', 'reply', email(), 'business')
+        with self.assertRaises(CircuitOpenError):
+            router.generate('Write a reply', 'reply', email(), 'business')
+
+        self.assertEqual(router.generate('Categorize this email', 'categorize', email()), 'business')
+        self.assertEqual(router.circuit_states(), {
+            Config.MODEL_STRONG: CircuitBreaker.OPEN,
+            Config.MODEL_FAST: CircuitBreaker.CLOSED
+        })
+        # Calls rejected by the open circuit never reached the model
+        self.assertEqual(router.stats()[Config.MODEL_STRONG]['failures'], Config.BREAKER_MIN_CALLS)
+
+
+if __name__ == '__main__':
+    unittest.main()